@@ -1,10 +1,11 @@
 from django.contrib import admin
 
-from .models import User, Auction, Category, Bid, Comment
+from .models import User, Auction, Category, Bid, Comment, ProxyBid
 
 # Register your models here.
 admin.site.register(User)
 admin.site.register(Auction)
 admin.site.register(Category)
 admin.site.register(Bid)
-admin.site.register(Comment)
\ No newline at end of file
+admin.site.register(Comment)
+admin.site.register(ProxyBid)
\ No newline at end of file
@@ -0,0 +1,295 @@
+import json
+
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_GET, require_http_methods
+
+from . import caching, history
+from .bidding import place_bid, place_proxy_bid, CLOSED, OUTBID
+from .feeds import current_feed_page, listing_feed, paginate_feed
+from .forms import Bid_form, Comment_form
+from .fragments import listing_cached, listing_modified, listing_version
+from .models import Auction, Comment
+from .streams import publish_bid, publish_comment
+from .watchlist import add_to_watchlist, remove_from_watchlist, watchlist_feed
+from .writes import run_write
+
+
+def _price(value):
+    # amounts of new bids are not rounded by the database yet
+    return None if value == None else f"{value:.2f}"
+
+
+def _time(value):
+    return None if value == None else value.isoformat()
+
+
+def _image(name):
+    return reverse("auctions:listing_image", args=[name]) if name else None
+
+
+# fields of a listing on a feed, all read from its ListingSummary, see feeds.listing_feed
+FEED_FIELDS = {
+    "id": lambda summary: summary.id,
+    "title": lambda summary: summary.title,
+    "current_price": lambda summary: _price(summary.current_price),
+    "category": lambda summary: summary.category_name or None,
+    "thumbnail": lambda summary: _image(summary.thumbnail),
+    "creator": lambda summary: summary.creator_name,
+    "is_active": lambda summary: summary.is_active,
+    "ends_at": lambda summary: _time(summary.ends_at),
+    "bid_count": lambda summary: summary.bid_count,
+}
+
+# fields of a single listing, read from the auction, its latest bids and comments are added to them
+LISTING_FIELDS = {
+    "id": lambda auction: auction.id,
+    "title": lambda auction: auction.title,
+    "starting_bid": lambda auction: _price(auction.starting_bid),
+    "current_price": lambda auction: _price(auction.current_price),
+    "category": lambda auction: auction.category.name if auction.category_id else None,
+    "image": lambda auction: auction.image or None,
+    "thumbnail": lambda auction: _image(auction.thumbnail),
+    "creator": lambda auction: auction.creator.username,
+    "is_active": lambda auction: auction.is_active,
+    "ends_at": lambda auction: _time(auction.ends_at),
+    "bid_count": lambda auction: auction.bid_count,
+    "watcher_count": lambda auction: auction.watcher_count,
+    "description": lambda auction: auction.description,
+    "detail_image": lambda auction: _image(auction.detail_image),
+    "highest_bidder": lambda auction: auction.highest_bidder.username if auction.highest_bidder_id else None,
+    "winner": lambda auction: auction.won_by.username if auction.won_by_id else None,
+}
+
+# the latest bids and comments shown with a listing, and cursors to the older ones
+HISTORY_FIELDS = ("bids", "bids_next_cursor", "comments", "comments_next_cursor")
+
+# json without whitespace between items, polling clients download it often
+COMPACT = {"separators": (",", ":")}
+
+
+def _response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=COMPACT)
+
+
+def _error(message, status):
+    return _response({"error": message}, status)
+
+
+def _fields(request, available):
+    """Returns the fields asked for by the comma separated 'fields' GET parameter,
+      all available fields without it, or None if an unknown field is asked for."""
+
+    if not request.GET.get("fields"):
+        return list(available)
+    fields = [field.strip() for field in request.GET["fields"].split(",") if field.strip()]
+    if not fields or any(field not in available for field in fields):
+        return None
+    return fields
+
+
+def _body(request):
+    """Returns the posted data of a JSON object or form body, or None if a JSON
+      body is not an object."""
+
+    if request.content_type != "application/json":
+        return request.POST
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _feed_response(request, page):
+    fields = _fields(request, FEED_FIELDS)
+    if fields == None:
+        return _error(f"Unknown field, choose from {', '.join(FEED_FIELDS)}.", 400)
+    return _response({
+        "items": [{field: FEED_FIELDS[field](auction) for field in fields} for auction in page],
+        "next_cursor": page.next_cursor,
+        "previous_cursor": page.previous_cursor,
+    })
+
+
+def _history_response(page, item):
+    return _response({"items": [item(entry) for entry in page], "next_cursor": page.next_cursor})
+
+
+def _bid(bid):
+    return {"amount": _price(bid.amount), "bidder": bid.creator.username, "created_at": _time(bid.created_at)}
+
+
+def _comment(comment):
+    return {"author": comment.creator.username, "content": comment.comment_content,
+            "created_at": _time(comment.created_at)}
+
+
+def _feed_page(request):
+    # read once for the ETag, Last-Modified and the response
+    if not hasattr(request, "feed_page"):
+        request.feed_page = current_feed_page(request.GET.get("sort"), request.GET.get("cursor"))
+    return request.feed_page
+
+
+def _feed_etag(request, *args, **kwargs):
+    # listings only drop out of a version of the feed when they end
+    return f'"feed-{caching.version("active_feed")}-{len(_feed_page(request))}"'
+
+
+def _feed_modified(request, *args, **kwargs):
+    modified, ended_at = caching.last_modified("active_feed"), _feed_page(request).ended_at
+    return modified if ended_at == None else max(modified, ended_at)
+
+
+def _listing_etag(request, listing):
+    return f'"listing-{listing}-{listing_version(listing)}"'
+
+
+def _listing_modified(request, listing):
+    return listing_modified(listing)
+
+
+@require_GET
+@condition(etag_func=_feed_etag, last_modified_func=_feed_modified)
+def listings(request):
+    """Returns a page of the active listings as JSON, sorted and paginated by the
+      'sort' and 'cursor' GET parameters like the index page, with the fields of
+      the 'fields' parameter, e.g. ?fields=id,title,current_price. Pages come from
+      the feed cache and are not modified until an auction or bid changes."""
+
+    return _feed_response(request, _feed_page(request))
+
+
+@require_GET
+@condition(etag_func=_listing_etag, last_modified_func=_listing_modified)
+def listing(request, listing):
+    """Returns a listing with its latest bids and comments as JSON, optionally only
+      the fields of the 'fields' GET parameter. The ETag and Last-Modified headers
+      follow the version of the listing, so polling clients get a 304 without a
+      query, and the JSON is cached per version."""
+
+    available = list(LISTING_FIELDS) + list(HISTORY_FIELDS)
+    fields = _fields(request, available)
+    if fields == None:
+        return _error(f"Unknown field, choose from {', '.join(available)}.", 400)
+
+    def build():
+        auction = (Auction.objects.select_related("creator", "category", "highest_bidder", "won_by")
+            .filter(pk=listing).first())
+        if auction == None:
+            return {}
+        bids = history.bid_history(auction)
+        comments = history.comment_history(auction)
+        return dict({field: LISTING_FIELDS[field](auction) for field in LISTING_FIELDS},
+            bids=[_bid(bid) for bid in bids], bids_next_cursor=bids.next_cursor,
+            comments=[_comment(comment) for comment in comments], comments_next_cursor=comments.next_cursor)
+
+    data = listing_cached(listing, "api", build)
+    if not data:
+        return _error("Listing not found.", 404)
+    return _response({field: data[field] for field in fields})
+
+
+@require_http_methods(["GET", "POST"])
+def listing_bids(request, listing):
+    """GET returns the bids on a listing older than the 'cursor' GET parameter. POST
+      places a bid of the user with the posted 'amount' and returns it with status
+      201, also if a proxy bid outbid it right away (outcome "proxy_outbid"), or
+      sets the maximum of the user's proxy bid to the posted 'max_amount' and
+      returns status 201 if the user has the highest bid. Returns status 409 with
+      the current price if the bid or maximum is outbid or the listing is closed,
+      or status 400 with the errors of an invalid amount."""
+
+    if request.method == "GET":
+        return _history_response(history.bid_history(listing, request.GET.get("cursor")), _bid)
+
+    if not request.user.is_authenticated:
+        return _error("Log in to bid.", 403)
+    data = _body(request)
+    if data == None:
+        return _error("Post a JSON object.", 400)
+    listing_obj = Auction.objects.filter(pk=listing).first()
+    if listing_obj == None:
+        return _error("Listing not found.", 404)
+
+    proxy = "max_amount" in data
+    form = Bid_form({"amount": data.get("max_amount")} if proxy else data, listing=listing_obj)
+    if not form.is_valid():
+        return _response({"errors": {"max_amount" if proxy else "amount": form.errors["amount"]}}, 400)
+
+    if proxy:
+        result = run_write(place_proxy_bid, listing_obj, request.user, form.cleaned_data["amount"])
+    else:
+        result = run_write(place_bid, listing_obj, request.user, form.cleaned_data["amount"])
+    for placed in result.bids:
+        publish_bid(listing_obj, placed)
+
+    if result.outcome in (OUTBID, CLOSED):
+        message = "Bid must be higher than the previous bids." if result.outcome == OUTBID else "Listing is closed."
+        return _response({"error": message, "outcome": result.outcome,
+                          "current_price": _price(result.current_price)}, 409)
+
+    if proxy:
+        return _response({"outcome": result.outcome, "max_amount": _price(form.cleaned_data["amount"]),
+                          "current_price": _price(result.current_price)}, 201)
+    return _response(dict(_bid(result.bid), outcome=result.outcome, current_price=_price(result.current_price)), 201)
+
+
+@require_http_methods(["GET", "POST"])
+def listing_comments(request, listing):
+    """GET returns the comments on a listing older than the 'cursor' GET parameter.
+      POST adds a comment of the user with the posted 'content' and returns it
+      with status 201, or status 400 with the errors of invalid content."""
+
+    if request.method == "GET":
+        return _history_response(history.comment_history(listing, request.GET.get("cursor")), _comment)
+
+    if not request.user.is_authenticated:
+        return _error("Log in to comment.", 403)
+    data = _body(request)
+    if data == None:
+        return _error("Post a JSON object.", 400)
+    if not Auction.objects.filter(pk=listing).exists():
+        return _error("Listing not found.", 404)
+
+    form = Comment_form(data)
+    if not form.is_valid():
+        return _response({"errors": form.errors}, 400)
+
+    new_comment = Comment(comment_content=form.cleaned_data["content"], creator=request.user, auction_id=listing)
+    run_write(new_comment.save)
+    publish_comment(new_comment)
+    return _response(_comment(new_comment), 201)
+
+
+@require_http_methods(["GET", "POST"])
+def watchlist(request):
+    """GET returns a page of the listings on the user's watchlist like the listings
+      endpoint. POST adds the listing ids of the posted 'add' list and removes those
+      of the 'remove' list, and returns the ids of all watched listings."""
+
+    if not request.user.is_authenticated:
+        return _error("Log in to use the watchlist.", 403)
+
+    if request.method == "GET":
+        return _feed_response(request, paginate_feed(listing_feed(watchlist_feed(request.user)),
+            request.GET.get("sort"), request.GET.get("cursor")))
+
+    data = _body(request)
+    if data == None:
+        return _error("Post a JSON object.", 400)
+
+    changes = {}
+    for action in ("add", "remove"):
+        ids = data.getlist(action) if hasattr(data, "getlist") else data.get(action, [])
+        if not isinstance(ids, list) or not all(str(pk).isdigit() for pk in ids):
+            return _error(f"'{action}' must be a list of listing ids.", 400)
+        changes[action] = [int(pk) for pk in ids]
+
+    if changes["add"]:
+        add_to_watchlist(request.user, Auction.objects.filter(pk__in=changes["add"]).values_list("pk", flat=True))
+    if changes["remove"]:
+        remove_from_watchlist(request.user, changes["remove"])
+
+    return _response({"watching": sorted(watchlist_feed(request.user).values_list("pk", flat=True))})
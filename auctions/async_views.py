@@ -0,0 +1,86 @@
+###################################################################
+# async_views.py
+#
+# - Async versions of the listing read views, used instead of the ones
+#   in views.py with the ASYNC_VIEWS setting
+###################################################################
+
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import render
+
+from . import views
+from .categories import aget_category, category_list
+from .feeds import acurrent_feed_page, active_listings, apaginate_feed, listing_feed
+from .util import aload_user, arender_listing
+from .watchlist import awatched_ids, watchlist_feed
+
+
+async def index(request, page_title="Active Listings", auctions=None, all_watched=False):
+    """Renders a page with a list of auction listings like views.index. The user
+      and the page of listings are loaded concurrently, a cached page of the active
+      listings is read without a thread."""
+
+    sort, cursor = request.GET.get("sort"), request.GET.get("cursor")
+    if auctions == None:
+        page = acurrent_feed_page(sort, cursor)
+    else:
+        page = apaginate_feed(listing_feed(auctions), sort, cursor)
+    user, page = await asyncio.gather(aload_user(request), page)
+
+    # look up the watched listings of the whole page at once
+    if all_watched:
+        watched = {auction.id for auction in page}
+    else:
+        watched = await awatched_ids(user, page.items)
+
+    return render(request, "auctions/index.html", {
+        "page_title": page_title,
+        "auctions": page,
+        "watched": watched
+    })
+
+
+async def view_listing(request, listing):
+    """Renders the page of a listing like views.view_listing. Posts change the
+      watchlist or close the listing, they are handled by the synchronous view."""
+
+    if request.method != "POST":
+        return await arender_listing(request, listing)
+
+    return await sync_to_async(views.view_listing)(request, listing)
+
+
+async def categories(request):
+    """Renders the page with all categories like views.categories."""
+
+    user, categories = await asyncio.gather(aload_user(request), category_list.acall())
+
+    return render(request, "auctions/categories.html", {
+        "categories": categories
+    })
+
+
+async def category(request, category):
+    """Renders a page with all the active listings in a certain category like
+      views.category."""
+
+    category_obj = await aget_category(category)
+    if category_obj == None:
+        raise Http404("Category not found.")
+
+    return await index(request, category_obj.name, active_listings().filter(category_id=category_obj.id))
+
+
+async def watchlist(request):
+    """Renders the user's watchlist like views.watchlist. Posts change the
+      watchlist, they are handled by the synchronous view."""
+
+    if request.method == "POST":
+        return await sync_to_async(views.watchlist)(request)
+
+    user = await aload_user(request)
+    return await index(request, "Watchlist", watchlist_feed(user), all_watched=True)
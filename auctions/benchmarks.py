@@ -0,0 +1,272 @@
+import contextlib
+import itertools
+import os
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.db.models import Count, OuterRef, Subquery
+from django.utils import timezone
+
+from .categories import recount_listings
+from .models import User, Auction, Bid, Category, Comment, ProxyBid
+from .summaries import rebuild_summaries
+
+
+# syllables the synthetic words are made of, so the vocabulary is large enough
+# for full-text search to behave like it does on real listings
+SYLLABLES = ["ka", "lo", "mi", "ne", "su", "ta", "ri", "po", "ve", "da", "gu", "fi", "ro",
+             "sa", "be", "mu", "zo", "le", "ni", "pa", "ku", "te", "yo", "ha"]
+
+BATCH_SIZE = 5000
+
+# sizes of the generated data sets, see generate_dataset
+SCALES = {
+    "10k": {"users": 1000, "categories": 20, "auctions": 10000, "bids": 50000, "comments": 20000, "watches": 20000},
+    "100k": {"users": 10000, "categories": 30, "auctions": 100000, "bids": 500000, "comments": 200000, "watches": 200000},
+    "1m": {"users": 50000, "categories": 50, "auctions": 1000000, "bids": 5000000, "comments": 2000000, "watches": 2000000},
+}
+
+# cumulative weights of the Zipf distribution used by pick_words
+_zipf_weights = []
+
+
+@contextlib.contextmanager
+def benchmark_database(keepdb=False, on_disk=False):
+    """Context manager that runs its block against a separate, migrated test
+      database, so benchmark data never ends up in the real database. With on_disk
+      an SQLite test database is a file next to the real one instead of in memory,
+      where concurrent connections would lock each other's tables."""
+
+    old_name = connection.settings_dict["NAME"]
+    test_settings = connection.settings_dict["TEST"]
+    old_test_name = test_settings.get("NAME")
+    if on_disk and connection.vendor == "sqlite" and connection.creation.is_in_memory_db(old_test_name or ":memory:"):
+        test_settings["NAME"] = str(Path(old_name).with_name("benchmark.sqlite3"))
+
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        test_name = connection.settings_dict["NAME"]
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        test_settings["NAME"] = old_test_name
+        # connections of other threads may still hold the write-ahead log files
+        if on_disk and connection.vendor == "sqlite" and not keepdb:
+            for suffix in ("-wal", "-shm"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(test_name + suffix)
+
+
+def vocabulary(size, seed=0):
+    """Returns a deterministic list of made up words."""
+
+    generator = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(generator.choice(SYLLABLES) for _ in range(generator.randint(2, 4))))
+    # shuffle so how common a word is does not depend on its spelling
+    words = sorted(words)
+    generator.shuffle(words)
+    return words
+
+
+def pick_words(generator, words, number):
+    """Picks words with a Zipf distribution, like words in real text: the n-th most
+      common word occurs about 1/n times as often as the most common one."""
+
+    if len(_zipf_weights) != len(words):
+        _zipf_weights[:] = itertools.accumulate(1 / rank for rank in range(1, len(words) + 1))
+    return generator.choices(words, cum_weights=_zipf_weights, k=number)
+
+
+def generate_users(count, seed=0):
+    """Creates count users named benchmark_user<number> and returns them."""
+
+    password = make_password("benchmark")
+    users = [User(username=f"benchmark_user{i}", email=f"user{i}@example.com", password=password)
+             for i in range(count)]
+    return User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+
+
+def generate_categories(count, seed=0):
+    """Creates count categories and returns them."""
+
+    return Category.objects.bulk_create([Category(name=f"Category {i}") for i in range(count)])
+
+
+def generate_auctions(count, users, categories, seed=0, words=None, progress=None):
+    """Creates count auctions with random titles, descriptions, prices and owners,
+      in batches. The same seed always gives the same auctions. Calls
+      progress(created) after every batch if given."""
+
+    generator = random.Random(seed)
+    words = words or vocabulary(5000, seed)
+    created = 0
+
+    while created < count:
+        batch = []
+        for _ in range(min(BATCH_SIZE, count - created)):
+            price = Decimal(generator.randint(100, 1000000)) / 100
+            batch.append(Auction(
+                title=" ".join(pick_words(generator, words, generator.randint(2, 6))).capitalize(),
+                description=" ".join(pick_words(generator, words, generator.randint(10, 60))),
+                starting_bid=price,
+                current_price=price,
+                creator=generator.choice(users),
+                category=generator.choice(categories),
+                is_active=generator.random() < 0.8))
+        Auction.objects.bulk_create(batch)
+        created += len(batch)
+        if progress:
+            progress(created)
+
+    # bulk_create sends no signals, so the category counts and summaries are set afterwards
+    recount_listings()
+    rebuild_summaries()
+    return words
+
+
+def generate_bids(count, users, seed=0, progress=None):
+    """Creates count bids spread over the active auctions, most of them on a few
+      popular auctions like on a real site, and updates the bid summaries of the
+      auctions to match. Every bid beats the previous one on its auction."""
+
+    generator = random.Random(seed)
+    auctions = list(Auction.objects.filter(is_active=True).values_list("id", "starting_bid"))
+    prices = dict(auctions)
+    start = timezone.now() - timedelta(seconds=count)
+    created = 0
+
+    while created < count:
+        batch = []
+        for _ in range(min(BATCH_SIZE, count - created)):
+            # half of the bids go to a few popular auctions
+            if generator.random() < 0.5:
+                listing = auctions[min(int(generator.paretovariate(1.2)), len(auctions)) - 1][0]
+            else:
+                listing = generator.choice(auctions)[0]
+            prices[listing] += Decimal(generator.randint(1, 500)) / 100
+            batch.append(Bid(auction_id=listing, creator=generator.choice(users), amount=prices[listing],
+                created_at=start + timedelta(seconds=created + len(batch))))
+        Bid.objects.bulk_create(batch)
+        created += len(batch)
+        if progress:
+            progress(created)
+
+    # set-based, like migration 0006
+    highest = Bid.objects.filter(auction=OuterRef("pk")).order_by("-amount", "-id")
+    bid_count = (Bid.objects.filter(auction=OuterRef("pk")).order_by()
+        .values("auction").annotate(count=Count("id")).values("count"))
+    Auction.objects.filter(pk__in=Bid.objects.values("auction")).update(
+        highest_bid=Subquery(highest.values("amount")[:1]),
+        current_price=Subquery(highest.values("amount")[:1]),
+        highest_bidder=Subquery(highest.values("creator")[:1]),
+        bid_count=Subquery(bid_count))
+    rebuild_summaries()
+
+
+def generate_comments(count, users, seed=0, words=None, progress=None):
+    """Creates count comments with random words on random auctions."""
+
+    generator = random.Random(seed)
+    words = words or vocabulary(5000, seed)
+    auctions = list(Auction.objects.values_list("id", flat=True))
+    start = timezone.now() - timedelta(seconds=count)
+    created = 0
+
+    while created < count:
+        batch = [Comment(auction_id=generator.choice(auctions), creator=generator.choice(users),
+                    comment_content=" ".join(pick_words(generator, words, generator.randint(3, 30))),
+                    created_at=start + timedelta(seconds=created + i))
+                 for i in range(min(BATCH_SIZE, count - created))]
+        Comment.objects.bulk_create(batch)
+        created += len(batch)
+        if progress:
+            progress(created)
+
+
+def generate_watches(count, users, seed=0, progress=None):
+    """Puts about count random auctions on the watchlists of random users and sets
+      the watcher counts of the auctions to match."""
+
+    generator = random.Random(seed)
+    Watch = User.watchlist.through
+    auctions = list(Auction.objects.values_list("id", flat=True))
+    created = 0
+
+    while created < count:
+        batch = [Watch(user_id=generator.choice(users).id, auction_id=generator.choice(auctions))
+                 for _ in range(min(BATCH_SIZE, count - created))]
+        # duplicates are skipped, so slightly fewer than count rows can be made
+        Watch.objects.bulk_create(batch, ignore_conflicts=True)
+        created += len(batch)
+        if progress:
+            progress(created)
+
+    watcher_count = (Watch.objects.filter(auction=OuterRef("pk")).order_by()
+        .values("auction").annotate(count=Count("id")).values("count"))
+    Auction.objects.filter(pk__in=Watch.objects.values("auction")).update(watcher_count=Subquery(watcher_count))
+
+
+def generate_proxy_bids(auction, users, seed=0, spread=Decimal(100)):
+    """Creates a proxy bid of every user on the auction, with random maximums
+      between its starting bid and spread over it, and returns them."""
+
+    generator = random.Random(seed)
+    proxies = [ProxyBid(auction=auction, bidder=user,
+                        max_amount=auction.starting_bid + Decimal(generator.randint(0, int(spread * 100))) / 100)
+               for user in users]
+    return ProxyBid.objects.bulk_create(proxies, batch_size=BATCH_SIZE)
+
+
+def generate_dataset(scale, seed=0, progress=None):
+    """Creates the users, categories, auctions, bids, comments and watchlists of one
+      of the SCALES. The same seed always gives the same data. Calls
+      progress(kind, created) while generating if given."""
+
+    sizes = SCALES[scale]
+
+    def report(kind):
+        return (lambda created: progress(kind, created)) if progress else None
+
+    users = generate_users(sizes["users"], seed)
+    categories = generate_categories(sizes["categories"], seed)
+    words = generate_auctions(sizes["auctions"], users, categories, seed, progress=report("auctions"))
+    generate_bids(sizes["bids"], users, seed, progress=report("bids"))
+    generate_comments(sizes["comments"], users, seed, words, progress=report("comments"))
+    generate_watches(sizes["watches"], users, seed, progress=report("watches"))
+
+
+def percentile(samples, fraction):
+    """Returns the value below which the given fraction of the samples fall."""
+
+    ordered = sorted(samples)
+    if not ordered:
+        return 0
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def timed(function, *args, **kwargs):
+    """Calls the function and returns the time it took in seconds."""
+
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def latency_report(samples):
+    """Returns a dictionary with the number, mean and percentiles of latencies given
+      in seconds, in milliseconds."""
+
+    return {
+        "count": len(samples),
+        "mean_ms": round(1000 * sum(samples) / len(samples), 3) if samples else 0,
+        "p50_ms": round(1000 * percentile(samples, 0.50), 3),
+        "p95_ms": round(1000 * percentile(samples, 0.95), 3),
+        "p99_ms": round(1000 * percentile(samples, 0.99), 3),
+    }
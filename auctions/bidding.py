@@ -0,0 +1,192 @@
+import random
+import time
+from decimal import Decimal
+
+from django.db import connection, transaction, OperationalError
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .feeds import active_feed_page
+from .fragments import invalidate_listing
+from .models import Auction, Bid, ProxyBid
+from .summaries import refresh_summaries
+
+
+# possible outcomes of placing a bid, a bid that was placed but is beaten right away
+# by the maximum of another bidder's proxy bid is PROXY_OUTBID
+ACCEPTED = "accepted"
+OUTBID = "outbid"
+PROXY_OUTBID = "proxy_outbid"
+CLOSED = "closed"
+
+# step by which proxy bids outbid other bids
+BID_INCREMENT = Decimal("1.00")
+
+# how often a bid is retried when SQLite reports the database as locked
+LOCK_RETRIES = 100
+LOCK_BACKOFF = 0.05
+
+
+class BidResult:
+    """The outcome of placing a bid. Attributes:
+      - outcome(string): ACCEPTED, OUTBID, PROXY_OUTBID or CLOSED.
+      - bid(Bid): The saved bid of the bidder if one was placed, otherwise None.
+      - current_price(Decimal): The price of the listing after the attempt.
+      - bids(list): All bids placed in the attempt, including those of proxy bids,
+        oldest first."""
+
+    def __init__(self, outcome, bid=None, current_price=None, bids=None):
+        self.outcome = outcome
+        self.bid = bid
+        self.current_price = current_price
+        self.bids = bids if bids != None else [bid] if bid != None else []
+
+    @property
+    def accepted(self):
+        return self.outcome == ACCEPTED
+
+
+def place_bid(listing_obj, user, amount):
+    """Places a bid of the user on the listing and returns a BidResult.
+
+      The bid is accepted with a single conditional UPDATE of the auction row, which
+      only matches while the listing is active and not past its end time, and the
+      amount beats the highest bid (or reaches the starting bid if there is none).
+      The database evaluates that condition under the row's write lock, so
+      concurrent bids cannot both win and the price can never go down. The bid row is inserted in the same transaction.
+      Proxy bids of other bidders with a higher maximum answer the bid in the same
+      transaction too, see resolve_proxy_bids."""
+
+    return _with_lock_retries(_place_bid, listing_obj.pk, user, amount)
+
+
+def _with_lock_retries(function, *args):
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return function(*args)
+        except OperationalError as error:
+            # SQLite refuses concurrent writers instead of queueing them, retry
+            # unless an outer transaction is now broken
+            if "locked" not in str(error) or connection.in_atomic_block or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(random.uniform(0, LOCK_BACKOFF))
+
+
+def _place_bid(listing, user, amount):
+    """Runs one attempt of place_bid in its own transaction."""
+
+    beats_price = Q(highest_bid=None, starting_bid__lte=amount) | Q(highest_bid__lt=amount)
+    # an expired auction takes no bids, even before closing.close_expired got to it
+    now = timezone.now()
+    not_ended = Q(ends_at=None) | Q(ends_at__gt=now)
+
+    with transaction.atomic():
+        updated = Auction.objects.filter(beats_price, not_ended, pk=listing, is_active=True).update(
+            current_price=amount,
+            highest_bid=amount,
+            highest_bidder=user,
+            bid_count=F("bid_count") + 1)
+
+        if updated:
+            new_bid = Bid.objects.create(amount=amount, creator=user, auction_id=listing)
+            answers = resolve_proxy_bids(listing, None, amount, user.pk)
+            if answers:
+                outcome = ACCEPTED if answers[-1].creator_id == user.pk else PROXY_OUTBID
+                return BidResult(outcome, new_bid, answers[-1].amount, [new_bid] + answers)
+            return BidResult(ACCEPTED, new_bid, amount)
+
+    is_active, ends_at, current_price = (Auction.objects
+        .values_list("is_active", "ends_at", "current_price").get(pk=listing))
+    if not is_active or (ends_at != None and ends_at <= now):
+        return BidResult(CLOSED, current_price=current_price)
+    return BidResult(OUTBID, current_price=current_price)
+
+
+def place_proxy_bid(listing_obj, user, max_amount):
+    """Sets the maximum the user bids on the listing and returns a BidResult. The
+      user's proxy bid then bids for the user, one BID_INCREMENT over the other
+      bids, up to the maximum, see resolve_proxy_bids. The outcome is ACCEPTED if
+      the user has the highest bid afterwards and OUTBID if another bidder bids or
+      will bid more, in which case a maximum that could never bid is not kept."""
+
+    return _with_lock_retries(_place_proxy_bid, listing_obj.pk, user, max_amount)
+
+
+def _place_proxy_bid(listing, user, max_amount):
+    """Runs one attempt of place_proxy_bid in its own transaction."""
+
+    now = timezone.now()
+    with transaction.atomic():
+        # written before the auction is read, so SQLite takes the write lock first
+        # a changed maximum counts as set now, so raising it to a rival's does not win the tie
+        if not ProxyBid.objects.filter(auction_id=listing, bidder=user).update(max_amount=max_amount,
+                created_at=Case(When(max_amount=max_amount, then=F("created_at")), default=Value(now))):
+            ProxyBid.objects.create(auction_id=listing, bidder=user, max_amount=max_amount, created_at=now)
+
+        is_active, ends_at, starting_bid, current_price, highest_bid, highest_bidder = (Auction.objects
+            .select_for_update().values_list("is_active", "ends_at", "starting_bid", "current_price",
+                "highest_bid", "highest_bidder").get(pk=listing))
+        if not is_active or (ends_at != None and ends_at <= now):
+            transaction.set_rollback(True)
+            return BidResult(CLOSED, current_price=current_price)
+
+        bids = resolve_proxy_bids(listing, starting_bid, highest_bid, highest_bidder)
+        if bids:
+            highest_bidder, current_price = bids[-1].creator_id, bids[-1].amount
+        elif highest_bidder != user.pk:
+            transaction.set_rollback(True)
+
+    own_bids = [bid for bid in bids if bid.creator_id == user.pk]
+    outcome = ACCEPTED if highest_bidder == user.pk else OUTBID
+    return BidResult(outcome, own_bids[-1] if own_bids else None, current_price, bids)
+
+
+def resolve_proxy_bids(listing, starting_bid, highest_bid, highest_bidder):
+    """Lets the proxy bids of a listing answer its current highest bid and bidder,
+      and returns the bids they placed. Must run in the transaction that changed
+      the listing, which holds its write lock.
+
+      Only the two highest maximums can change the outcome, so they are read with
+      one query from the proxy_bid_auction_max_idx index, however many proxy bids
+      compete: the highest maximum wins, the earlier one of equal maximums. The
+      runner-up bids its whole maximum and the winner one BID_INCREMENT more, or
+      its own maximum if that is less, so all rounds of bidding between them are
+      resolved at once. The starting_bid is only needed while highest_bid is None."""
+
+    top = list(ProxyBid.objects.filter(auction_id=listing).order_by("-max_amount", "created_at")
+        .values_list("bidder_id", "max_amount")[:2])
+    if not top:
+        return []
+
+    def beats(amount):
+        return amount >= starting_bid if highest_bid == None else amount > highest_bid
+
+    leader, leader_max = top[0]
+    if leader != highest_bidder and not beats(leader_max):
+        return []
+
+    competing = [amount for bidder, amount in top[1:]]
+    if highest_bid != None and leader != highest_bidder:
+        competing.append(highest_bid)
+    price = min(leader_max, max(competing) + BID_INCREMENT) if competing else None
+    if highest_bid == None:
+        price = max(price or starting_bid, starting_bid)
+    if price == None or (leader == highest_bidder and price <= highest_bid):
+        return []
+
+    bids = []
+    now = timezone.now()
+    # a runner-up's maximum equal to the price does not beat the leader's bid
+    if len(top) > 1 and beats(top[1][1]) and top[1][1] < price:
+        bids.append(Bid(amount=top[1][1], creator_id=top[1][0], auction_id=listing, created_at=now))
+    bids.append(Bid(amount=price, creator_id=leader, auction_id=listing, created_at=now))
+
+    Bid.objects.bulk_create(bids)
+    Auction.objects.filter(pk=listing).update(current_price=price, highest_bid=price, highest_bidder=leader,
+        bid_count=F("bid_count") + len(bids))
+
+    # bulk_create and update send no signals, so refresh the summary and invalidate the caches here
+    refresh_summaries([listing])
+    invalidate_listing(listing)
+    active_feed_page.invalidate()
+    return bids
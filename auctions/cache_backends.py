@@ -0,0 +1,319 @@
+import pickle
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class _LRUStore:
+    """The values of one LRU cache location, shared by the cache handles of all threads."""
+
+    def __init__(self):
+        self.data = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+
+_lru_stores = {}
+_lru_stores_lock = threading.Lock()
+
+
+class LRUCache(BaseCache):
+    """In-process cache backend that evicts the least recently used values once it
+      holds more than MAX_ENTRIES values or more than MAX_SIZE bytes of pickled
+      data. Values expire after their timeout. Options:
+      - MAX_ENTRIES(int): Maximum number of values, defaults to 300.
+      - MAX_SIZE(int): Maximum total size in bytes, defaults to 64 MB."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._max_size = int(params.get("max_size", options.get("MAX_SIZE", 64 * 1024 * 1024)))
+        with _lru_stores_lock:
+            self._store = _lru_stores.setdefault(location, _LRUStore())
+
+    def _live(self, key):
+        """Returns the pickled value of a key if it has not expired, or None.
+          Must be called with the store lock held."""
+
+        entry = self._store.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            self._delete(key)
+            return None
+        return entry[0]
+
+    def _put(self, key, pickled, expiry):
+        """Stores a pickled value and evicts the least recently used values while
+          the cache is too full. Must be called with the store lock held."""
+
+        self._delete(key)
+        if len(pickled) > self._max_size:
+            return
+
+        self._store.data[key] = (pickled, expiry)
+        self._store.size += len(pickled)
+
+        while len(self._store.data) > self._max_entries or self._store.size > self._max_size:
+            evicted, (value, evicted_expiry) = self._store.data.popitem(last=False)
+            self._store.size -= len(value)
+
+    def _delete(self, key):
+        entry = self._store.data.pop(key, None)
+        if entry is None:
+            return False
+        self._store.size -= len(entry[0])
+        return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._store.lock:
+            if self._live(key) is not None:
+                return False
+            self._put(key, pickled, self.get_backend_timeout(timeout))
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            pickled = self._live(key)
+            if pickled is None:
+                return default
+            self._store.data.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._store.lock:
+            self._put(key, pickled, self.get_backend_timeout(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            pickled = self._live(key)
+            if pickled is None:
+                return False
+            self._store.data[key] = (pickled, self.get_backend_timeout(timeout))
+            self._store.data.move_to_end(key)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            pickled = self._live(key)
+            if pickled is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(pickled) + delta
+            self._put(key, pickle.dumps(new_value, pickle.HIGHEST_PROTOCOL), self._store.data[key][1])
+        return new_value
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            return self._live(key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            return self._delete(key)
+
+    def clear(self):
+        with self._store.lock:
+            self._store.data.clear()
+            self._store.size = 0
+
+    # the values are in memory and the lock is only held briefly, so async views
+    # read and write them directly instead of in a thread like BaseCache does
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.add(key, value, timeout, version)
+
+    async def aget(self, key, default=None, version=None):
+        return self.get(key, default, version)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.set(key, value, timeout, version)
+
+
+# cache backends that live in one process, other processes never see their
+# invalidations, see checks.check_local_cache
+LOCAL_CACHES = (LocMemCache, LRUCache)
+
+
+class RESPError(Exception):
+    """An error reply of a Redis protocol server."""
+
+
+class RESPConnection:
+    """A blocking connection to a server that speaks the Redis serialization
+      protocol (RESP), e.g. Redis, KeyDB or Valkey."""
+
+    def __init__(self, host, port, db=0, password=None, timeout=5):
+        self._socket = socket.create_connection((host, port), timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile("rb")
+        if password:
+            self.execute("AUTH", password)
+        if db:
+            self.execute("SELECT", db)
+
+    def execute(self, *args):
+        """Sends a command and returns its reply."""
+
+        self._socket.sendall(self._encode(args))
+        return self._read_reply()
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+    @staticmethod
+    def _encode(args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the cache server")
+
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RESPError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length == -1:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RESPError(f"Unknown reply type {kind!r}")
+
+
+class RESPCache(BaseCache):
+    """Cache backend for servers speaking the Redis protocol, without the need for a
+      client library. LOCATION is an url like redis://:password@host:6379/0. Every
+      thread keeps its own connection. Integers are stored as plain numbers so
+      incr() is done by the server, other values are pickled."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        url = urlparse(location)
+        self._host = url.hostname or "127.0.0.1"
+        self._port = url.port or 6379
+        self._db = int(url.path.lstrip("/") or 0)
+        self._password = url.password
+        self._local = threading.local()
+
+    def _execute(self, *args):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = RESPConnection(self._host, self._port, self._db, self._password)
+            self._local.connection = connection
+
+        try:
+            return connection.execute(*args)
+        except (OSError, ConnectionError):
+            # drop the broken connection so the next call reconnects
+            connection.close()
+            self._local.connection = None
+            raise
+
+    @staticmethod
+    def _dumps(value):
+        if type(value) is int:
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(data):
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def _expiry_args(self, timeout):
+        """Returns the SET arguments for a timeout, or None if it has already expired."""
+
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        if timeout is None:
+            return ()
+        if timeout <= 0:
+            return None
+        return ("PX", int(timeout * 1000))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expiry = self._expiry_args(timeout)
+        if expiry is None:
+            return False
+        return self._execute("SET", key, self._dumps(value), "NX", *expiry) == "OK"
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        data = self._execute("GET", key)
+        return default if data is None else self._loads(data)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        cache_keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        values = self._execute("MGET", *cache_keys)
+        return {cache_keys[cache_key]: self._loads(data)
+                for cache_key, data in zip(cache_keys, values) if data is not None}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expiry = self._expiry_args(timeout)
+        if expiry is None:
+            self._execute("DEL", key)
+        else:
+            self._execute("SET", key, self._dumps(value), *expiry)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expiry = self._expiry_args(timeout)
+        if expiry is None:
+            return bool(self._execute("DEL", key))
+        if not expiry:
+            return bool(self._execute("PERSIST", key)) or self.has_key(key, version=version)
+        return bool(self._execute("PEXPIRE", key, expiry[1]))
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        if not self._execute("EXISTS", key):
+            raise ValueError("Key '%s' not found" % key)
+        return self._execute("INCRBY", key, delta)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._execute("EXISTS", key))
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._execute("DEL", key))
+
+    def clear(self):
+        self._execute("FLUSHDB")
+
+    def close(self, **kwargs):
+        # connections are kept for the lifetime of the thread, like database connections
+        pass
@@ -0,0 +1,174 @@
+import functools
+import hashlib
+import itertools
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from commerce.databases import use_primary
+
+
+# default time a cached value is kept, a new namespace version replaces it sooner
+DEFAULT_TIMEOUT = 60 * 60
+
+# process wide hit and miss counters per namespace group (the part of a namespace
+# before the first colon, e.g. "listing" for "listing:12"), next() on
+# itertools.count is atomic under the GIL so no lock is needed
+_counters = {}
+_stats = {}
+
+# sent with the namespace group and hit(bool) on every lookup, e.g. for per request
+# metrics in commerce.instrumentation
+cache_accessed = Signal()
+
+
+def _version_key(namespace):
+    return f"auctions:version:{namespace}"
+
+
+def version(namespace):
+    """Returns the current version of a cache namespace. Every key in the namespace
+      contains the version, so bumping it invalidates them all at once."""
+
+    current = cache.get(_version_key(namespace))
+    if current is None:
+        # start from the clock so a lost version never points at old values
+        cache.add(_version_key(namespace), time.time_ns(), None)
+        current = cache.get(_version_key(namespace), 0)
+    return current
+
+
+async def aversion(namespace):
+    """Returns the current version of a cache namespace like version(), through the
+      async interface of the cache."""
+
+    current = await cache.aget(_version_key(namespace))
+    if current is None:
+        await cache.aadd(_version_key(namespace), time.time_ns(), None)
+        current = await cache.aget(_version_key(namespace), 0)
+    return current
+
+
+def invalidate(namespace):
+    """Moves a cache namespace to a new version, so its values are built again. In a
+      transaction it moves on again once the transaction commits: until then other
+      connections read the old rows, and values they build from them are cached in
+      the first new version."""
+
+    _bump(namespace)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(namespace))
+
+
+def _bump(namespace):
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), time.time_ns(), None)
+
+
+def last_modified(namespace):
+    """Returns when the current version of a cache namespace was first asked for,
+      which is at or shortly after the change that made it, e.g. for Last-Modified
+      headers next to an ETag of the version."""
+
+    return cache.get_or_set(f"auctions:modified:{namespace}:{version(namespace)}", timezone.now, DEFAULT_TIMEOUT)
+
+
+def _key(namespace, current, args):
+    digest = hashlib.md5(repr(args).encode()).hexdigest()
+    return f"auctions:{namespace}:{current}:{digest}"
+
+
+def make_key(namespace, *args):
+    """Returns the cache key of the given arguments in the current version of a namespace."""
+
+    return _key(namespace, version(namespace), args)
+
+
+def record(namespace, hit):
+    """Counts a cache hit or miss for the group of a namespace."""
+
+    group = namespace.split(":", 1)[0]
+    if group not in _counters:
+        _counters.setdefault(group, (itertools.count(1), itertools.count(1)))
+        _stats.setdefault(group, {"hits": 0, "misses": 0})
+
+    hits, misses = _counters[group]
+    if hit:
+        _stats[group]["hits"] = next(hits)
+    else:
+        _stats[group]["misses"] = next(misses)
+
+    cache_accessed.send(sender=None, namespace=group, hit=hit)
+
+
+def cache_stats():
+    """Returns the cache hits and misses of this process per namespace group."""
+
+    return {namespace: dict(counts) for namespace, counts in _stats.items()}
+
+
+def get_or_build(namespace, args, build, timeout=DEFAULT_TIMEOUT):
+    """Returns the cached value for the arguments in the namespace, calling build()
+      and caching its result on a miss. build() reads from the primary database: a
+      replica may not have the change that made the new version yet, and its stale
+      rows would be cached under that version."""
+
+    key = make_key(namespace, *args)
+    value = cache.get(key)
+
+    if value is not None:
+        record(namespace, hit=True)
+        return value
+
+    record(namespace, hit=False)
+    with use_primary():
+        value = build()
+    cache.set(key, value, timeout)
+    return value
+
+
+async def aget_or_build(namespace, args, build, timeout=DEFAULT_TIMEOUT):
+    """Returns the cached value for the arguments in the namespace like
+      get_or_build(), through the async interface of the cache. build is a
+      coroutine function, awaited on a miss with reads from the primary."""
+
+    key = _key(namespace, await aversion(namespace), args)
+    value = await cache.aget(key)
+
+    if value is not None:
+        record(namespace, hit=True)
+        return value
+
+    record(namespace, hit=False)
+    with use_primary():
+        value = await build()
+    await cache.aset(key, value, timeout)
+    return value
+
+
+def cached(namespace, timeout=DEFAULT_TIMEOUT):
+    """Decorator that caches the return value of a function per arguments in a
+      namespace. The arguments must have a stable repr, e.g. strings and numbers.
+      The wrapped function gets an invalidate() attribute that drops all values,
+      and an acall() coroutine function for async views that only runs the function
+      in a thread on a miss."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args):
+            return get_or_build(namespace, args, lambda: function(*args), timeout)
+
+        async def acall(*args):
+            return await aget_or_build(namespace, args, lambda: sync_to_async(function)(*args), timeout)
+
+        wrapper.invalidate = lambda: invalidate(namespace)
+        wrapper.acall = acall
+        return wrapper
+
+    return decorator
@@ -0,0 +1,253 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .categories import category_choices, category_list, count_listings
+from .feeds import active_feed_page
+from .forms import New_listing_form
+from .models import Auction, Bid
+from .summaries import refresh_summaries
+
+
+# formats a catalogue can be read and written in
+CSV = "csv"
+JSONL = "jsonl"
+FORMATS = (CSV, JSONL)
+
+# number of listings inserted by one bulk_create
+IMPORT_BATCH_SIZE = 1000
+
+# number of auctions loaded at a time by an export, with their bids
+EXPORT_CHUNK_SIZE = 500
+
+# number of row errors kept by an ImportReport, the others are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# columns of an exported catalogue, the first ones can be imported again
+EXPORT_FIELDS = ("title", "description", "starting_bid", "category", "image", "id", "current_price", "is_active",
+                 "ends_at", "creator", "bids")
+
+
+class RowError(Exception):
+    """A row of a catalogue that could not be read or is not a valid listing.
+      Attributes:
+      - line(int): The line number of the row, the CSV header is line 1.
+      - errors(dict): Error messages per field, "__all__" if the row could not be read."""
+
+    def __init__(self, line, errors):
+        super().__init__(f"Line {line}: {errors}")
+        self.line = line
+        self.errors = errors
+
+    def as_dict(self):
+        return {"line": self.line, "errors": self.errors}
+
+
+class ImportReport:
+    """The outcome of an import. Attributes:
+      - created(int): Number of listings that were created.
+      - skipped(int): Number of rows that were not valid listings.
+      - errors(list): RowErrors of the first MAX_REPORTED_ERRORS skipped rows."""
+
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+
+    def add_error(self, error):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(error)
+
+    def as_dict(self):
+        return {"created": self.created, "skipped": self.skipped, "errors": [error.as_dict() for error in self.errors]}
+
+
+def read_rows(stream, format):
+    """Yields (line, row) pairs of a text stream of CSV with a header or of JSON
+      Lines, one object per line, without reading the whole stream. Rows that
+      cannot be parsed are yielded as RowErrors."""
+
+    if format == CSV:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == JSONL:
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as error:
+                yield line, RowError(line, {"__all__": [f"Invalid JSON: {error}"]})
+                continue
+            if not isinstance(row, dict):
+                yield line, RowError(line, {"__all__": ["Expected a JSON object."]})
+                continue
+            yield line, row
+    else:
+        raise ValueError(f"Unknown format {format}")
+
+
+class _RawStream(io.RawIOBase):
+    """A raw binary stream of an object with only a read method, like a request."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.source.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def text_stream(binary):
+    """Wraps a binary stream, e.g. an uploaded file or the request itself for its
+      body, to be read as UTF-8 text by read_rows."""
+
+    if not hasattr(binary, "readable"):
+        binary = io.BufferedReader(_RawStream(binary))
+    return io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+
+
+def _category_ids():
+    """Returns a mapping of category names in lower case and ids, as strings, to
+      category ids, built from the cached category list without a query."""
+
+    ids = {}
+    for category in category_list():
+        ids[category.name.lower()] = category.id
+        ids[str(category.id)] = category.id
+    return ids
+
+
+def _listing(line, row, categories, choices, creator, now):
+    """Returns an unsaved Auction of a row, validated by New_listing_form with the
+      given category choices, or raises a RowError."""
+
+    data = {field: "" if value == None else str(value) for field, value in row.items()}
+    category = data.get("category", "").strip()
+    data["category"] = categories.get(category.lower(), category)
+
+    form = New_listing_form(data)
+    form.fields["category"].choices = choices
+    if not form.is_valid():
+        raise RowError(line, {field: list(messages) for field, messages in form.errors.items()})
+
+    fields = form.cleaned_data
+    auction = Auction(title=fields["title"], description=fields["description"],
+        starting_bid=fields["starting_bid"], current_price=fields["starting_bid"],
+        category_id=fields["category"], image=fields["image"] or None, creator=creator)
+    if fields["duration"] != None:
+        auction.ends_at = now + timedelta(days=fields["duration"])
+    return auction
+
+
+def _insert(batch):
+    """Inserts a batch of listings in one transaction, counts them in their
+      categories and summarizes them, bulk_create sends no signals."""
+
+    with transaction.atomic():
+        Auction.objects.bulk_create(batch)
+        refresh_summaries(auction.id for auction in batch)
+        categories = {}
+        for auction in batch:
+            categories[auction.category_id] = categories.get(auction.category_id, 0) + 1
+        count_listings(categories)
+
+
+def import_listings(rows, creator, batch_size=IMPORT_BATCH_SIZE, on_error=None):
+    """Creates listings of the given creator from (line, row) pairs of read_rows and
+      returns an ImportReport. Every row is validated like a listing created with
+      the form, categories can be given by name or id. Valid rows are inserted in
+      batches of batch_size, invalid rows are skipped and passed to on_error(error)
+      if given, so a large import can report errors while it runs."""
+
+    report = ImportReport()
+    categories = _category_ids()
+    # read once instead of from the cache for every row
+    choices = category_choices()
+    now = timezone.now()
+    batch = []
+
+    for line, row in rows:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            batch.append(_listing(line, row, categories, choices, creator, now))
+        except RowError as error:
+            report.add_error(error)
+            if on_error:
+                on_error(error)
+            continue
+
+        if len(batch) >= batch_size:
+            _insert(batch)
+            report.created += len(batch)
+            batch = []
+
+    if batch:
+        _insert(batch)
+        report.created += len(batch)
+
+    if report.created:
+        active_feed_page.invalidate()
+    return report
+
+
+def _export_row(auction):
+    return {
+        "title": auction.title,
+        "description": auction.description,
+        "starting_bid": str(auction.starting_bid),
+        "category": auction.category.name if auction.category else "",
+        "image": auction.image or "",
+        "id": auction.id,
+        "current_price": str(auction.current_price),
+        "is_active": auction.is_active,
+        "ends_at": auction.ends_at.isoformat() if auction.ends_at else None,
+        "creator": auction.creator.username,
+        "bids": [{"amount": str(bid.amount), "bidder": bid.creator.username, "created_at": bid.created_at.isoformat()}
+                 for bid in auction.auction_bids.all()],
+    }
+
+
+class _Echo:
+    """A file-like object whose write returns the text, for csv.writer."""
+
+    def write(self, text):
+        return text
+
+
+def export_listings(auctions, format):
+    """Yields the lines of a catalogue of a queryset of auctions with their bids, in
+      CSV, with the bids as a JSON column, or in JSON Lines. The auctions and their
+      bids are loaded EXPORT_CHUNK_SIZE auctions at a time, so the table is never
+      loaded at once."""
+
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format}")
+
+    bids = Prefetch("auction_bids", queryset=Bid.objects.select_related("creator").order_by("created_at", "id"))
+    auctions = (auctions.select_related("creator", "category").prefetch_related(bids).order_by("id")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+    if format == JSONL:
+        for auction in auctions:
+            yield json.dumps(_export_row(auction)) + "\n"
+        return
+
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for auction in auctions:
+        row = _export_row(auction)
+        row["bids"] = json.dumps(row["bids"])
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
@@ -0,0 +1,75 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .caching import cached
+from .models import Auction, Category
+
+
+@cached("categories")
+def category_list():
+    """Returns a list of all categories with their active listing counts. The list
+      is built on first use and cached until a category or its count changes."""
+
+    return list(Category.objects.order_by("name", "id"))
+
+
+def category_choices():
+    """Returns the (id, name) choices of all categories, from the cached list. Pass
+      the function itself as the choices of a form field, so they are read when the
+      form is used instead of when the module is imported."""
+
+    return [(category.id, category.name) for category in category_list()]
+
+
+def _find(categories, pk):
+    for category in categories:
+        if str(category.pk) == str(pk):
+            return category
+    return None
+
+
+def get_category(pk):
+    """Returns the category with the given id (int or string) from the cached list,
+      or None if there is none."""
+
+    return _find(category_list(), pk)
+
+
+async def aget_category(pk):
+    """Returns the category with the given id like get_category, for async views."""
+
+    return _find(await category_list.acall(), pk)
+
+
+def counted_category(is_active, category_id):
+    """Returns the id of the category whose active_listings counts an auction in
+      this state, or None if no category counts it."""
+
+    return category_id if is_active and category_id != None else None
+
+
+def count_listings(changes):
+    """Adds changes, a mapping of category id to a number of listings, to the active
+      listing counts, with one UPDATE per distinct number, and invalidates the
+      cached category list."""
+
+    by_change = {}
+    for category, change in changes.items():
+        if category != None and change:
+            by_change.setdefault(change, []).append(category)
+    if not by_change:
+        return
+
+    for change, categories in by_change.items():
+        Category.objects.filter(pk__in=categories).update(active_listings=F("active_listings") + change)
+    category_list.invalidate()
+
+
+def recount_listings():
+    """Counts the active listings of all categories again in one set-based update,
+      e.g. after auctions were bulk created or updated without signals."""
+
+    count = (Auction.objects.filter(category=OuterRef("pk"), is_active=True).order_by()
+        .values("category").annotate(count=Count("id")).values("count"))
+    Category.objects.update(active_listings=Coalesce(Subquery(count), 0))
+    category_list.invalidate()
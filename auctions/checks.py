@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Error, register, Tags
+
+from .cache_backends import LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_local_cache(app_configs, **kwargs):
+    """Refuses a cache that lives in one process when the server runs several
+      worker processes, as set by WEB_CONCURRENCY. Each worker would keep serving
+      pages it never saw invalidated, and count the rate limits on its own."""
+
+    backend = type(caches["default"])
+    if settings.WEB_CONCURRENCY <= 1 or not issubclass(backend, LOCAL_CACHES):
+        return []
+
+    return [Error(
+        f"The {backend.__name__} cache lives in each of the {settings.WEB_CONCURRENCY} worker processes.",
+        hint="Use CACHE_BACKEND=file on a single host or CACHE_BACKEND=redis, or run one worker.",
+        id="auctions.E001",
+    )]
@@ -0,0 +1,97 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .categories import count_listings
+from .feeds import active_feed_page
+from .fragments import invalidate_listing
+from .models import Auction
+from .streams import broker, publish_closed
+from .summaries import refresh_summaries
+
+
+# number of auctions closed by one update
+CLOSE_BATCH_SIZE = 1000
+
+
+def expired_auctions(now=None):
+    """Returns a queryset of the active auctions whose end time has passed, found
+      through the auction_active_ends_idx index."""
+
+    return Auction.objects.filter(is_active=True, ends_at__lte=now or timezone.now())
+
+
+def close_expired(now=None, batch_size=CLOSE_BATCH_SIZE):
+    """Closes up to batch_size expired auctions, the ones that ended first first, and
+      returns how many were closed.
+
+      The batch is closed with a single UPDATE that also copies the highest bidder of
+      every auction to won_by, so no row is loaded or saved one by one. The UPDATE
+      checks again that the auctions are active and expired, which makes it safe to
+      run next to bidders, creators closing their listings and other closers: a bid
+      either lands before the row is closed and is then the winning bid, or is
+      refused by place_bid. The active listing counts of the categories are lowered
+      in the same transaction."""
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        # the rows are locked until the update, so the counts match the closed auctions
+        rows = list(expired_auctions(now).select_for_update().order_by("ends_at")
+            .values_list("id", "category_id")[:batch_size])
+        if not rows:
+            return 0
+
+        batch = [listing for listing, category in rows]
+        closed = expired_auctions(now).filter(pk__in=batch).update(is_active=False, won_by=F("highest_bidder"))
+
+        changes = Counter()
+        for listing, category in rows:
+            changes[category] -= 1
+        count_listings(changes)
+        refresh_summaries(batch)
+
+    # a queryset update sends no post_save signals, so the summaries are refreshed above and the caches here
+    for listing in batch:
+        invalidate_listing(listing)
+    active_feed_page.invalidate()
+
+    # watchers in this process are told now, event streams in other processes
+    # see the end time pass themselves, see views.listing_events
+    watched = [listing for listing in batch if broker.subscriber_count(listing)]
+    if watched:
+        for listing_obj in Auction.objects.filter(pk__in=watched).select_related("won_by"):
+            publish_closed(listing_obj)
+
+    return closed
+
+
+def close_listing(listing):
+    """Closes the active auction with the given id, e.g. when its creator ends it
+      early, and returns whether this call closed it.
+
+      Like close_expired it closes with a conditional UPDATE that copies the highest
+      bidder to won_by under the row's write lock, so a bid either lands before and
+      wins, or is refused by place_bid. Of concurrent closers, including
+      close_expired, only the one whose UPDATE matched lowers the category count."""
+
+    with transaction.atomic():
+        if not Auction.objects.filter(pk=listing, is_active=True).update(is_active=False,
+                                                                          won_by=F("highest_bidder")):
+            return False
+        category = Auction.objects.values_list("category_id", flat=True).get(pk=listing)
+        count_listings({category: -1})
+        refresh_summaries([listing])
+
+    # a queryset update sends no post_save signals
+    invalidate_listing(listing)
+    active_feed_page.invalidate()
+    return True
+
+
+def next_expiry():
+    """Returns the end time of the active auction that ends next, or None."""
+
+    return (Auction.objects.filter(is_active=True, ends_at__isnull=False)
+        .order_by("ends_at").values_list("ends_at", flat=True).first())
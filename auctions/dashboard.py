@@ -0,0 +1,81 @@
+from django.db.models import Count, Q
+
+from .feeds import FeedPage, listing_feed, paginate_feed
+from .models import Auction
+
+
+# number of listings shown per section of the dashboard
+DASHBOARD_PAGE_SIZE = 10
+
+
+def _sections(user):
+    """Returns the conditions of the dashboard sections of a user as (name, title,
+      condition) triples. Every condition starts with a foreign key column, so each
+      section is read from that column's index."""
+
+    return [
+        ("created", "Listings you have created", Q(creator=user)),
+        ("active", "Your active listings", Q(creator=user, is_active=True)),
+        ("won", "Listings you have won", Q(won_by=user)),
+        ("leading", "Listings where you have the highest bid", Q(highest_bidder=user, is_active=True)),
+    ]
+
+
+class DashboardSection:
+    """A section of a user's dashboard. Attributes:
+      - name(string): Name of the section, its cursor is the '<name>_cursor' GET parameter.
+      - title(string): Heading of the section.
+      - count(int): Number of listings in the section.
+      - page(FeedPage): The listings of the section on the current page.
+      - next_query(string): Query string of the following page, keeping the pages of
+        the other sections, None on the last page.
+      - previous_query(string): Query string of the preceding page, None on the first page."""
+
+    def __init__(self, name, title, count, page, next_query=None, previous_query=None):
+        self.name = name
+        self.title = title
+        self.count = count
+        self.page = page
+        self.next_query = next_query
+        self.previous_query = previous_query
+
+
+def dashboard_counts(user):
+    """Returns the number of listings in each dashboard section of the user as a
+      dictionary, counted by one aggregate query over the user's rows."""
+
+    sections = _sections(user)
+    condition = Q()
+    for name, title, section in sections:
+        condition |= section
+
+    return Auction.objects.filter(condition).aggregate(**{
+        name: Count("id", filter=section) for name, title, section in sections
+    })
+
+
+def _query(params, key, cursor):
+    params = params.copy()
+    params[key] = cursor
+    return params.urlencode()
+
+
+def dashboard(user, params, page_size=DASHBOARD_PAGE_SIZE):
+    """Returns the DashboardSections of the user, each paginated newest first by its
+      own cursor in params (a QueryDict, e.g. request.GET). Sections without
+      listings are not queried."""
+
+    counts = dashboard_counts(user)
+    sections = []
+    for name, title, condition in _sections(user):
+        key = f"{name}_cursor"
+        if counts[name]:
+            page = paginate_feed(listing_feed(Auction.objects.filter(condition)), cursor=params.get(key),
+                page_size=page_size)
+        else:
+            page = FeedPage([], None)
+
+        sections.append(DashboardSection(name, title, counts[name], page,
+            page.next_cursor and _query(params, key, page.next_cursor),
+            page.previous_cursor and _query(params, key, page.previous_cursor)))
+    return sections
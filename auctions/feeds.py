@@ -0,0 +1,219 @@
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import cached
+from .models import ListingSummary
+
+# orderings a feed can be sorted by, each ends with the id so the order is total
+SORT_ORDERS = {
+    "newest": ("-id",),
+    "price_asc": ("current_price", "id"),
+    "price_desc": ("-current_price", "-id"),
+}
+DEFAULT_SORT = "newest"
+
+# how the key values of a cursor are read back, per field of the sort orders
+CURSOR_FIELDS = {"id": int, "current_price": Decimal}
+PAGE_SIZE = 25
+
+
+def active_listings():
+    """Returns the summaries of the listings that can still be bid on. Auctions
+      stay active after their end time until close_auctions closes them, which may
+      not run, so the end time is checked as well."""
+
+    return ListingSummary.objects.filter(Q(ends_at=None) | Q(ends_at__gt=timezone.now()), is_active=True)
+
+
+def listing_feed(auctions=None):
+    """Returns the listing summaries of the given queryset of auctions, to be
+      rendered as a listing feed from one table without joins. A queryset of
+      ListingSummaries is returned as it is, so feeds that filter on summary columns
+      are read from their indexes alone. Defaults to all active listings."""
+
+    if auctions is None:
+        return active_listings()
+    if auctions.model is ListingSummary:
+        return auctions
+
+    return ListingSummary.objects.filter(id__in=auctions.order_by().values("id"))
+
+
+class FeedPage:
+    """A single page of a listing feed. Attributes:
+      - items(list): The ListingSummaries on this page.
+      - sort(string): The sort order the page was built with.
+      - next_cursor(string): Token for the following page, None on the last page.
+      - previous_cursor(string): Token for the preceding page, None on the first page.
+      - ended_at(datetime): The latest end time of the listings left out by unexpired()."""
+
+    def __init__(self, items, sort, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.sort = sort
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.ended_at = None
+
+    def unexpired(self, now=None):
+        """Returns the page without the listings that have ended since it was built,
+          for pages read from the cache. The cursors stay the same."""
+
+        now = now or timezone.now()
+        ended = [item.ends_at for item in self.items if item.ends_at != None and item.ends_at <= now]
+        if not ended:
+            return self
+
+        page = FeedPage([item for item in self.items if item.ends_at == None or item.ends_at > now],
+                        self.sort, self.next_cursor, self.previous_cursor)
+        page.ended_at = max(ended)
+        return page
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(sort, direction, auction):
+    """Returns an url safe token pointing just past (direction "next") or just
+      before (direction "previous") the given auction in the given sort order."""
+
+    values = [str(getattr(auction, field.lstrip("-"))) for field in SORT_ORDERS[sort]]
+    data = json.dumps([sort, direction, values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    """Returns the (direction, values) pair of a cursor token, or None if the token
+      is missing, malformed or was made for another sort order."""
+
+    if not cursor:
+        return None
+
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, direction, values = json.loads(data)
+        if (cursor_sort != sort or direction not in ("next", "previous")
+                or not isinstance(values, list) or len(values) != len(SORT_ORDERS[sort])
+                or not all(isinstance(value, str) for value in values)):
+            return None
+        values = [CURSOR_FIELDS[field.lstrip("-")](value) for field, value in zip(SORT_ORDERS[sort], values)]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, InvalidOperation):
+        return None
+
+    # NaN and infinity are not prices
+    if not all(value.is_finite() for value in values if isinstance(value, Decimal)):
+        return None
+    return direction, values
+
+
+def feed_parameters(sort, cursor):
+    """Returns the sort order and cursor a page is built with, the default order
+      and no cursor for unknown or malformed ones, so cached pages are shared by
+      every request that gets the same page."""
+
+    if sort not in SORT_ORDERS:
+        sort = DEFAULT_SORT
+    if decode_cursor(cursor, sort) == None:
+        cursor = None
+    return sort, cursor
+
+
+def reverse_ordering(ordering):
+    """Returns the given ordering with every field flipped."""
+
+    return tuple(field[1:] if field.startswith("-") else "-" + field for field in ordering)
+
+
+def keyset_filter(ordering, values):
+    """Returns a Q object selecting the rows that come after the given key values
+      in the given ordering, i.e. a lexicographic row comparison."""
+
+    condition = Q()
+    for position in reversed(range(len(ordering))):
+        field = ordering[position].lstrip("-")
+        lookup = "lt" if ordering[position].startswith("-") else "gt"
+        equal = {ordering[i].lstrip("-"): values[i] for i in range(position)}
+        condition = Q(**equal, **{f"{field}__{lookup}": values[position]}) | condition
+
+    return condition
+
+
+def _page_query(auctions, sort, cursor, page_size):
+    """Returns the sort order, the decoded cursor and the queryset of a feed page,
+      with one row more than the page to find out if there is a next page."""
+
+    if sort not in SORT_ORDERS:
+        sort = DEFAULT_SORT
+
+    ordering = SORT_ORDERS[sort]
+    position = decode_cursor(cursor, sort)
+
+    if position is not None and position[0] == "previous":
+        ordering = reverse_ordering(ordering)
+    if position is not None:
+        auctions = auctions.filter(keyset_filter(ordering, position[1]))
+
+    return sort, position, auctions.order_by(*ordering)[:page_size + 1]
+
+
+def _feed_page(items, sort, position, page_size):
+    backwards = position is not None and position[0] == "previous"
+    has_more = len(items) > page_size
+    items = items[:page_size]
+
+    if backwards:
+        items.reverse()
+
+    page = FeedPage(items, sort)
+    if items:
+        if has_more or backwards:
+            page.next_cursor = encode_cursor(sort, "next", items[-1])
+        if position is not None and (has_more or not backwards):
+            page.previous_cursor = encode_cursor(sort, "previous", items[0])
+
+    return page
+
+
+def paginate_feed(auctions, sort=DEFAULT_SORT, cursor=None, page_size=PAGE_SIZE):
+    """Returns a FeedPage of the given queryset of auctions. Pages are found by
+      seeking to the key of the cursor instead of using an offset, so every page
+      costs the same single query."""
+
+    sort, position, query = _page_query(auctions, sort, cursor, page_size)
+    return _feed_page(list(query), sort, position, page_size)
+
+
+async def apaginate_feed(auctions, sort=DEFAULT_SORT, cursor=None, page_size=PAGE_SIZE):
+    """Returns a FeedPage like paginate_feed, read with the async ORM interface."""
+
+    sort, position, query = _page_query(auctions, sort, cursor, page_size)
+    return _feed_page([item async for item in query], sort, position, page_size)
+
+
+@cached("active_feed", timeout=5 * 60)
+def active_feed_page(sort=DEFAULT_SORT, cursor=None):
+    """Returns a FeedPage of all active auctions. Pages are cached until an auction
+      or bid changes."""
+
+    return paginate_feed(listing_feed(), sort, cursor)
+
+
+def current_feed_page(sort=None, cursor=None):
+    """Returns the cached FeedPage of all active auctions for the given, unchecked,
+      sort and cursor parameters, without the listings that have ended since."""
+
+    return active_feed_page(*feed_parameters(sort, cursor)).unexpired()
+
+
+async def acurrent_feed_page(sort=None, cursor=None):
+    """Returns the page of current_feed_page, read from the cache without a thread."""
+
+    page = await active_feed_page.acall(*feed_parameters(sort, cursor))
+    return page.unexpired()
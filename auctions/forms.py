@@ -1,29 +1,32 @@
 from django import forms
 from django.core.exceptions import ValidationError
 
-from .models import Auction, Category
+from .categories import category_choices, category_list
+from .search import ACTIVE, CLOSED, ALL
 
 
 class New_listing_form(forms.Form):
     """Creates a Django form to create a new listing. Attrubutes:
       - title(string): The title of the auction.
       - description(string): Description of the auction.
-      - starting_bid(float): Mininmum price of the auction."""
+      - starting_bid(float): Mininmum price of the auction.
+      - duration(int): Number of days until the auction closes by itself, optional."""
 
     title = forms.CharField(label="Title", max_length=100)
     description = forms.CharField(label="Description", widget=forms.Textarea, max_length=1000)
     starting_bid = forms.DecimalField(label="Starting Bid", max_digits=10, decimal_places=2)
-    category = forms.CharField(
-        label="Category", 
-        widget=forms.Select(choices=Category.objects.values_list("id", "name").distinct()))
+    # choices are read from the cached category list whenever the form is used
+    category = forms.TypedChoiceField(label="Category", coerce=int, choices=category_choices)
     image = forms.URLField(required=False)
+    duration = forms.TypedChoiceField(label="Duration", required=False, coerce=int, empty_value=None,
+        choices=[("", "Until closed"), (1, "1 day"), (3, "3 days"), (7, "7 days"), (14, "14 days")])
 
 
 class Bid_form(forms.Form):
     """Creates a Django form to place a bid. Attrubutes:
       - amount(float): The amount of the bid.
       keyword argument:
-      - listing(string): Id of the listing object that the bid is related to."""
+      - listing(Auction): The listing object that the bid is related to."""
 
     amount = forms.DecimalField(label=False, max_digits=10, decimal_places=2)
 
@@ -37,20 +40,61 @@ class Bid_form(forms.Form):
           or lower than or equal to a previous bid."""
 
         amount = self.cleaned_data["amount"]
-        listing_obj = Auction.objects.get(pk=self.listing)
 
-        if listing_obj.auction_bids.last() == None:
-            if amount < listing_obj.starting_bid:
+        if self.listing.highest_bid == None:
+            if amount < self.listing.starting_bid:
                 raise ValidationError("Error: Bid is lower than the starting bid.")
         else:
-            if amount <= listing_obj.auction_bids.last().amount:
+            if amount <= self.listing.highest_bid:
                 raise ValidationError("Error: Bid must be higher than the previous bids.")
 
         return amount
 
 
+class Proxy_bid_form(Bid_form):
+    """Creates a Django form to set the maximum of a proxy bid, which bids for the
+      user up to that amount. The maximum must beat the price like a bid. Attrubutes:
+      - amount(float): The most the user wants to pay.
+      keyword argument:
+      - listing(Auction): The listing object that the proxy bid is related to."""
+
+    amount = forms.DecimalField(label="Maximum bid", max_digits=10, decimal_places=2)
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("prefix", "proxy")
+        super().__init__(*args, **kwargs)
+
+
 class Comment_form(forms.Form):
     """Creates a Django form to place a comment. Attrubutes:
       - content(string): The content of the comment."""
 
-    content = forms.CharField(label=False, widget=forms.Textarea, max_length=500)
\ No newline at end of file
+    content = forms.CharField(label=False, widget=forms.Textarea, max_length=500)
+
+class Search_form(forms.Form):
+    """Creates a Django form to search listings. Attrubutes:
+      - q(string): The words to search for.
+      - status(string): Whether to search active, closed or all listings.
+      - category(string): Id of the category to search in, optional.
+      - min_price(float), max_price(float): Price range of the listings, optional."""
+
+    q = forms.CharField(label="Search", max_length=200)
+    status = forms.ChoiceField(label="Status", required=False, initial=ACTIVE,
+        choices=[(ACTIVE, "Active"), (CLOSED, "Closed"), (ALL, "All")])
+    category = forms.CharField(label="Category", required=False, widget=forms.Select)
+    min_price = forms.DecimalField(label="Min price", required=False, max_digits=10, decimal_places=2)
+    max_price = forms.DecimalField(label="Max price", required=False, max_digits=10, decimal_places=2)
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def __init__(self, *args, **kwargs):
+        super(Search_form, self).__init__(*args, **kwargs)
+        self.fields["category"].widget.choices = [("", "All categories")] + [
+            (category.id, category.name) for category in category_list()]
+
+    def clean_category(self):
+        """Raises a ValidationError if the category is not a category id."""
+
+        category = self.cleaned_data["category"]
+        if category and not category.isdigit():
+            raise ValidationError("Error: Unknown category.")
+        return category
@@ -0,0 +1,94 @@
+import asyncio
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import caching
+from .history import abid_history, acomment_history, bid_history, comment_history
+from .models import Auction
+
+
+def _namespace(listing):
+    return f"listing:{listing}"
+
+
+def invalidate_listing(listing):
+    """Moves the listing with the given id to a new fragment version, so the next
+      page view renders its fragment again."""
+
+    caching.invalidate(_namespace(listing))
+
+
+def listing_version(listing):
+    """Returns the current version of the listing with the given id, which changes
+      with every change to the listing, its bids, comments or watchers."""
+
+    return caching.version(_namespace(listing))
+
+
+def listing_modified(listing):
+    """Returns when the listing with the given id last changed, see caching.last_modified."""
+
+    return caching.last_modified(_namespace(listing))
+
+
+def listing_cached(listing, name, build):
+    """Returns the value of build() for the listing with the given id, cached under
+      name until the listing changes, like its fragments."""
+
+    return caching.get_or_build(_namespace(listing), (name,), build)
+
+
+def _from_replica(listing_obj):
+    # the listing may come from a replica that lags behind the cached version
+    return listing_obj._state.db not in (None, "default")
+
+
+def _render_fragment(listing_obj, bids, comments):
+    context = {
+        "auction": listing_obj,
+        "current_bids": bids,
+        "comments": comments,
+    }
+    return {
+        "details": render_to_string("auctions/listing_details.html", context),
+        "comments": render_to_string("auctions/listing_comments.html", context),
+    }
+
+
+def listing_fragment(listing_obj):
+    """Returns the parts of the listing page that are the same for every user as a
+      dictionary of rendered html: 'details' (description, price and latest bids)
+      and 'comments' (latest comments). Fragments are cached per listing version."""
+
+    def build():
+        current = listing_obj
+        if _from_replica(listing_obj):
+            current = Auction.objects.select_related("creator", "category").get(pk=listing_obj.pk)
+        return _render_fragment(current, bid_history(current), comment_history(current))
+
+    fragment = caching.get_or_build(_namespace(listing_obj.pk), (), build)
+
+    return {name: mark_safe(html) for name, html in fragment.items()}
+
+
+async def alisting_fragment(listing_obj):
+    """Returns the fragments of the listing page like listing_fragment, for async
+      views. On a miss the bids and comments are read concurrently."""
+
+    async def build():
+        current = listing_obj
+        if _from_replica(listing_obj):
+            current = await Auction.objects.select_related("creator", "category").aget(pk=listing_obj.pk)
+        bids, comments = await asyncio.gather(abid_history(current), acomment_history(current))
+        return _render_fragment(current, bids, comments)
+
+    fragment = await caching.aget_or_build(_namespace(listing_obj.pk), (), build)
+
+    return {name: mark_safe(html) for name, html in fragment.items()}
+
+
+def fragment_cache_stats():
+    """Returns the number of listing fragment cache hits and misses of this process."""
+
+    return caching.cache_stats().get("listing", {"hits": 0, "misses": 0})
@@ -0,0 +1,111 @@
+import base64
+import binascii
+import json
+
+from django.utils.dateparse import parse_datetime
+
+from .feeds import keyset_filter
+from .models import Bid, Comment
+
+
+# number of bids and comments shown on a listing page and loaded per "load more"
+HISTORY_PAGE_SIZE = 10
+
+# newest first, the id breaks ties between rows created at the same time
+HISTORY_ORDERING = ("-created_at", "-id")
+
+
+class HistoryPage:
+    """A page of the bids or comments of a listing, newest first. Attributes:
+      - items(list): The bids or comments on this page, with their creators loaded.
+      - next_cursor(string): Token for the older items, None on the last page."""
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(item):
+    """Returns an url safe token pointing just past the given bid or comment."""
+
+    data = json.dumps([item.created_at.isoformat(), item.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns the (created_at, id) pair of a cursor token, or None if the token is
+      missing or malformed."""
+
+    if not cursor:
+        return None
+
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, pk = json.loads(data)
+        created_at = parse_datetime(created_at)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+
+    if created_at == None or not isinstance(pk, int):
+        return None
+    return created_at, pk
+
+
+def _history_query(items, cursor, page_size):
+    """Returns the queryset of a page of bids or comments of one listing, with one
+      row more than the page to find out if there is a next page. The page is read
+      from the (auction, created_at, id) index by seeking to the cursor, so old
+      pages of long histories cost the same as the first one."""
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        items = items.filter(keyset_filter(HISTORY_ORDERING, position))
+
+    return items.select_related("creator").order_by(*HISTORY_ORDERING)[:page_size + 1]
+
+
+def _history_page(items, page_size):
+    page = HistoryPage(items[:page_size])
+    if len(items) > page_size:
+        page.next_cursor = encode_cursor(page.items[-1])
+    return page
+
+
+def _history(items, cursor, page_size):
+    return _history_page(list(_history_query(items, cursor, page_size)), page_size)
+
+
+async def _ahistory(items, cursor, page_size):
+    return _history_page([item async for item in _history_query(items, cursor, page_size)], page_size)
+
+
+def bid_history(listing, cursor=None, page_size=HISTORY_PAGE_SIZE):
+    """Returns a HistoryPage of the bids on a listing (an Auction or its id)."""
+
+    return _history(Bid.objects.filter(auction_id=getattr(listing, "pk", listing)), cursor, page_size)
+
+
+def comment_history(listing, cursor=None, page_size=HISTORY_PAGE_SIZE):
+    """Returns a HistoryPage of the comments on a listing (an Auction or its id)."""
+
+    return _history(Comment.objects.filter(auction_id=getattr(listing, "pk", listing)), cursor, page_size)
+
+
+async def abid_history(listing, cursor=None, page_size=HISTORY_PAGE_SIZE):
+    """Returns a HistoryPage of the bids on a listing like bid_history, read with
+      the async ORM interface."""
+
+    return await _ahistory(Bid.objects.filter(auction_id=getattr(listing, "pk", listing)), cursor, page_size)
+
+
+async def acomment_history(listing, cursor=None, page_size=HISTORY_PAGE_SIZE):
+    """Returns a HistoryPage of the comments on a listing like comment_history, read
+      with the async ORM interface."""
+
+    return await _ahistory(Comment.objects.filter(auction_id=getattr(listing, "pk", listing)), cursor, page_size)
@@ -0,0 +1,252 @@
+import hashlib
+import http.client
+import io
+import ipaddress
+import logging
+import os
+import re
+import socket
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Auction
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+# renditions of a listing image per model field: (width, height) and whether the
+# image is cropped to exactly that size or only shrunk to fit in it
+RENDITIONS = {
+    "thumbnail": ((240, 240), True),
+    "detail_image": ((1024, 1024), False),
+}
+
+JPEG_QUALITY = 85
+
+# names of stored images, the SHA-256 of their content
+IMAGE_NAME = re.compile(r"[0-9a-f]{64}\.jpg")
+
+# stored images never change, so browsers and proxies may keep them for a year
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# largest image that is downloaded, and seconds to wait for the image host
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+FETCH_TIMEOUT = 10
+
+# threads fetching the images of new listings
+IMAGE_WORKERS = 2
+
+
+class ImageError(Exception):
+    """An image that could not be fetched or is not a valid image."""
+
+
+def _check_url(url):
+    """Raises an ImageError unless the url is http(s) on a public address, so
+      listings cannot make the server fetch from its own network. The address is
+      checked again on connecting, see _connect_public. Private addresses are
+      allowed with settings.IMAGE_FETCH_ALLOW_PRIVATE, e.g. in tests."""
+
+    parts = urlparse(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ImageError(f"Not an http(s) url: {url}")
+    if getattr(settings, "IMAGE_FETCH_ALLOW_PRIVATE", False):
+        return
+
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, parts.port or 0, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as error:
+        raise ImageError(f"Unknown host {parts.hostname}: {error}")
+    for address in addresses:
+        if not ipaddress.ip_address(address[4][0]).is_global:
+            raise ImageError(f"Host {parts.hostname} is not a public address.")
+
+
+def _connect_public(address, *args, **kwargs):
+    """Connects like socket.create_connection, but raises an ImageError unless the
+      connected peer is a public address. The host is resolved again to connect, so
+      _check_url alone would let a host that changes its DNS answer in between
+      (DNS rebinding) reach the server's own network."""
+
+    sock = socket.create_connection(address, *args, **kwargs)
+    if getattr(settings, "IMAGE_FETCH_ALLOW_PRIVATE", False):
+        return sock
+    peer = sock.getpeername()[0]
+    if not ipaddress.ip_address(peer).is_global:
+        sock.close()
+        raise ImageError(f"Host {address[0]} connected to {peer}, which is not a public address.")
+    return sock
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _connect_public
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _connect_public
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    """Opens http urls only on public addresses, see _connect_public."""
+
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    """Opens https urls only on public addresses, see _connect_public."""
+
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _CheckedRedirects(urllib.request.HTTPRedirectHandler):
+    """Follows redirects only to urls that _check_url allows."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        _check_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# no proxies from the environment, the connected peer has to be the image host
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), _PublicHTTPHandler,
+                                      _PublicHTTPSHandler, _CheckedRedirects)
+
+
+def fetch_image(url, max_bytes=MAX_IMAGE_BYTES, timeout=FETCH_TIMEOUT):
+    """Downloads the image at the url and returns its bytes. Raises an ImageError if
+      the download fails, is not an image or is larger than max_bytes."""
+
+    _check_url(url)
+    request = urllib.request.Request(url, headers={"Accept": "image/*"})
+    try:
+        with _opener.open(request, timeout=timeout) as response:
+            content_type = response.headers.get_content_type()
+            if not content_type.startswith("image/"):
+                raise ImageError(f"Not an image: {content_type}")
+            if int(response.headers.get("Content-Length") or 0) > max_bytes:
+                raise ImageError(f"Image is larger than {max_bytes} bytes.")
+            # the length header may be missing or wrong
+            data = response.read(max_bytes + 1)
+    except (urllib.error.URLError, OSError, ValueError) as error:
+        raise ImageError(f"Could not fetch {url}: {error}")
+
+    if len(data) > max_bytes:
+        raise ImageError(f"Image is larger than {max_bytes} bytes.")
+    return data
+
+
+def render_image(data, size, crop):
+    """Returns the image data resized to size as JPEG bytes, cropped to fill the
+      size exactly if crop is true, otherwise shrunk to fit in it. Needs Pillow."""
+
+    if Image == None:
+        raise ImageError("Resizing images needs Pillow, install it with pip install Pillow.")
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # lets the JPEG decoder skip detail that the rendition does not need
+            image.draft("RGB", size)
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            if crop:
+                image = ImageOps.fit(image, size, Image.LANCZOS)
+            else:
+                image.thumbnail(size, Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise ImageError(f"Not a valid image: {error}")
+    return output.getvalue()
+
+
+def image_path(name):
+    """Returns the file of a stored image name, in a directory per first two
+      characters so no directory gets too large."""
+
+    return os.path.join(settings.IMAGE_ROOT, name[:2], name)
+
+
+def store_image(data):
+    """Saves image bytes under settings.IMAGE_ROOT and returns their name, the
+      SHA-256 of the content, so equal images are stored once and a name never
+      points at other content."""
+
+    name = hashlib.sha256(data).hexdigest() + ".jpg"
+    path = image_path(name)
+    if os.path.exists(path):
+        return name
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # written under a temporary name first, so a file is never served half written
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return name
+
+
+def process_listing_image(listing):
+    """Fetches the image of a listing (an Auction or its id) once, stores its
+      RENDITIONS and saves their names on the listing. Returns whether the listing
+      has its renditions now, a listing without image has none."""
+
+    auction = Auction.objects.filter(pk=getattr(listing, "pk", listing)).only("image").first()
+    if auction == None or not auction.image:
+        return False
+
+    data = fetch_image(auction.image)
+    for field, (size, crop) in RENDITIONS.items():
+        setattr(auction, field, store_image(render_image(data, size, crop)))
+    # the save signals invalidate the cached feed and listing page, which show them
+    auction.save(update_fields=list(RENDITIONS))
+    return True
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _process_in_background(listing):
+    try:
+        process_listing_image(listing)
+    except ImageError as error:
+        logger.warning("Image of listing %s not processed: %s", listing, error)
+    except Exception:
+        logger.exception("Image of listing %s not processed", listing)
+    finally:
+        close_old_connections()
+
+
+def process_listing_image_later(listing):
+    """Processes the image of a new listing on a background thread once the
+      transaction that created it is committed, so creating it does not wait for
+      the image host. Failed images are tried again by the process_images command."""
+
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="images")
+    listing = getattr(listing, "pk", listing)
+    transaction.on_commit(lambda: _executor.submit(_process_in_background, listing))
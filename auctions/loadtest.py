@@ -0,0 +1,364 @@
+import asyncio
+import http.client
+import itertools
+import json
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode, urlparse
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.models import Max
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from commerce import instrumentation
+
+from .benchmarks import latency_report
+from .models import User, Auction, Category
+
+
+# ways to send the traffic: through the test client, through the ASGI handler with
+# the async test client, or over HTTP to a threaded WSGI server or to a server at
+# an url, e.g. uvicorn commerce.asgi:application
+MODES = ("client", "asgi", "wsgi", "url")
+
+# the traffic mixes, with the weight of every action
+MIXES = {
+    "browse": {"index": 50, "category": 20, "view_listing": 30},
+    "bid_storm": {"bid": 80, "view_listing": 20},
+    "watchlist": {"watch_toggle": 70, "watchlist_page": 30},
+    "writes": {"bid": 70, "comment": 30},
+    "mixed": {"index": 40, "category": 10, "view_listing": 30, "bid": 10, "watch_toggle": 5, "watchlist_page": 5},
+}
+
+# URL names of the views the actions hit, to find their queries per request
+ACTION_VIEWS = {
+    "index": "auctions:index",
+    "category": "auctions:category",
+    "view_listing": "auctions:view_listing",
+    "bid": "auctions:bid",
+    "comment": "auctions:comment",
+    "watch_toggle": "auctions:watchlist",
+    "watchlist_page": "auctions:watchlist",
+}
+
+# number of most bid on auctions the bid storms and listing views focus on
+HOT_AUCTIONS = 20
+
+# value of the csrf cookie and header sent over HTTP
+CSRF_SECRET = "loadtestloadtestloadtestloadtest"
+
+
+class TrafficData:
+    """The ids a traffic mix picks from, loaded once before the run. Attributes:
+      - users(list): Users the workers are logged in as.
+      - auctions(list): Ids of active auctions.
+      - hot(list): Ids of the active auctions with the most bids.
+      - categories(list): Ids of all categories.
+      - bid_amounts(iterator): Increasing bid amounts above every current price."""
+
+    def __init__(self, workers):
+        self.users = list(User.objects.order_by("id")[:workers])
+        self.auctions = list(Auction.objects.filter(is_active=True).values_list("id", flat=True))
+        self.hot = list(Auction.objects.filter(is_active=True).order_by("-bid_count", "id")
+            .values_list("id", flat=True)[:HOT_AUCTIONS])
+        self.categories = list(Category.objects.values_list("id", flat=True))
+
+        highest = Auction.objects.aggregate(highest=Max("current_price"))["highest"] or Decimal(0)
+        self.bid_amounts = (highest + 1 + Decimal(step) / 100 for step in itertools.count())
+        self._lock = threading.Lock()
+
+    def next_bid_amount(self):
+        with self._lock:
+            return next(self.bid_amounts)
+
+
+class Request:
+    """A request of a traffic mix. Attributes:
+      - action(string): The action of MIXES it belongs to.
+      - method(string): "GET" or "POST".
+      - path(string): The path and query string.
+      - data(dict): The POST data."""
+
+    def __init__(self, action, method, path, data=None):
+        self.action = action
+        self.method = method
+        self.path = path
+        self.data = data or {}
+
+
+def make_request(action, generator, data):
+    """Returns the next Request of an action."""
+
+    if action == "index":
+        sort = generator.choice(["newest", "price_asc", "price_desc"])
+        return Request(action, "GET", reverse("auctions:index") + "?" + urlencode({"sort": sort}))
+    if action == "category":
+        return Request(action, "GET", reverse("auctions:category", args=[generator.choice(data.categories)]))
+    if action == "view_listing":
+        listing = generator.choice(data.hot if generator.random() < 0.5 else data.auctions)
+        return Request(action, "GET", reverse("auctions:view_listing", args=[listing]))
+    if action == "bid":
+        return Request(action, "POST", reverse("auctions:bid", args=[generator.choice(data.hot)]),
+            {"amount": str(data.next_bid_amount())})
+    if action == "comment":
+        return Request(action, "POST", reverse("auctions:comment", args=[generator.choice(data.hot)]),
+            {"content": f"Load test comment {generator.randrange(10 ** 6)}"})
+    if action == "watch_toggle":
+        return Request(action, "POST", reverse("auctions:watchlist"),
+            {generator.choice(["add", "remove"]): "", "listing": generator.choice(data.hot + data.auctions[:1000])})
+    if action == "watchlist_page":
+        return Request(action, "GET", reverse("auctions:watchlist"))
+    raise ValueError(f"Unknown action {action}")
+
+
+def request_plan(mix, requests, seed):
+    """Returns the deterministic list of actions a worker runs."""
+
+    generator = random.Random(seed)
+    actions, weights = zip(*MIXES[mix].items())
+    return generator.choices(actions, weights=weights, k=requests)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def _session_cookie(user):
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def _http_worker(base_url, user, plan, generator, data, results):
+    url = urlparse(base_url)
+    headers = {
+        "Cookie": f"{settings.SESSION_COOKIE_NAME}={_session_cookie(user)}; "
+                  f"{settings.CSRF_COOKIE_NAME}={CSRF_SECRET}",
+        "X-CSRFToken": CSRF_SECRET,
+        "Referer": base_url,
+    }
+    connection = None
+    for action in plan:
+        request = make_request(action, generator, data)
+        body = urlencode(request.data, doseq=True) if request.method == "POST" else None
+        request_headers = dict(headers, **({"Content-Type": "application/x-www-form-urlencoded"} if body else {}))
+
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+            connection.request(request.method, request.path, body, request_headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader("Connection", "").lower() == "close" or response.version == 10:
+                connection.close()
+                connection = None
+        except OSError:
+            status = None
+            connection = None
+        results.append((action, time.perf_counter() - start, status))
+    connections.close_all()
+
+
+def _client_worker(user, plan, generator, data, results):
+    client = Client(raise_request_exception=False)
+    client.force_login(user)
+    for action in plan:
+        request = make_request(action, generator, data)
+        start = time.perf_counter()
+        if request.method == "POST":
+            response = client.post(request.path, request.data)
+        else:
+            response = client.get(request.path)
+        results.append((action, time.perf_counter() - start, response.status_code))
+    connections.close_all()
+
+
+async def _asgi_worker(client, plan, generator, data, results):
+    for action in plan:
+        request = make_request(action, generator, data)
+        start = time.perf_counter()
+        if request.method == "POST":
+            response = await client.post(request.path, request.data)
+        else:
+            response = await client.get(request.path)
+        results.append((action, time.perf_counter() - start, response.status_code))
+
+
+def _send(mode, url, data, plans, generators, results):
+    """Runs the plans of all workers and returns the time it took."""
+
+    workers = range(len(plans))
+    if mode == "asgi":
+        clients = []
+        for worker in workers:
+            clients.append(AsyncClient(raise_request_exception=False))
+            clients[-1].force_login(data.users[worker])
+
+        async def run_all():
+            await asyncio.gather(*(_asgi_worker(clients[worker], plans[worker], generators[worker], data, results)
+                for worker in workers))
+
+        start = time.perf_counter()
+        asyncio.run(run_all())
+        return time.perf_counter() - start
+
+    server = None
+    if mode == "wsgi":
+        server = make_server("127.0.0.1", 0, get_wsgi_application(),
+            server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+
+    if mode == "client":
+        threads = [threading.Thread(target=_client_worker,
+            args=(data.users[worker], plans[worker], generators[worker], data, results)) for worker in workers]
+    else:
+        threads = [threading.Thread(target=_http_worker,
+            args=(url, data.users[worker], plans[worker], generators[worker], data, results)) for worker in workers]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+    return duration
+
+
+def run_traffic(mix, mode="client", requests=1000, concurrency=4, seed=0, url=None):
+    """Sends requests of a traffic mix, spread over concurrency workers that are each
+      logged in as another user, and returns a report with the throughput, latency
+      percentiles and queries per request, overall and per action."""
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode}")
+
+    data = TrafficData(concurrency)
+    workers = range(min(concurrency, len(data.users)))
+    plans = [request_plan(mix, requests // len(workers), seed + worker) for worker in workers]
+    generators = [random.Random(seed + 1000 + worker) for worker in workers]
+    results = []
+
+    before = instrumentation.view_totals()
+    if mode in ("client", "asgi"):
+        # the test clients send requests to the host "testserver", and a few users from
+        # one address send the traffic of many, which the rate limits would reject
+        with override_settings(ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ["testserver"], RATE_LIMITS={}):
+            duration = _send(mode, url, data, plans, generators, results)
+    elif mode == "wsgi":
+        with override_settings(RATE_LIMITS={}):
+            duration = _send(mode, url, data, plans, generators, results)
+    else:
+        duration = _send(mode, url, data, plans, generators, results)
+    after = instrumentation.view_totals()
+
+    report = {
+        "mix": mix,
+        "mode": mode,
+        "views": "async" if settings.ASYNC_VIEWS else "sync",
+        "concurrency": len(workers),
+        "requests": len(results),
+        "errors": sum(1 for action, latency, status in results if status == None or status >= 400),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(results) / duration, 1) if duration else 0,
+        "latency": latency_report([latency for action, latency, status in results]),
+        "actions": {},
+    }
+
+    for action in sorted(set(action for action, latency, status in results)):
+        report["actions"][action] = latency_report(
+            [latency for name, latency, status in results if name == action])
+        # the server of the url mode runs in another process, its queries are not seen
+        if mode != "url":
+            report["actions"][action]["queries_per_request"] = _queries_per_request(
+                ACTION_VIEWS[action], before, after)
+
+    return report
+
+
+def _queries_per_request(view, before, after):
+    if view not in after:
+        return None
+    requests = after[view].requests - (before[view].requests if view in before else 0)
+    queries = after[view].queries - (before[view].queries if view in before else 0)
+    return round(queries / requests, 2) if requests else None
+
+
+def _report_key(report):
+    # runs of the async views are compared with their own baseline
+    key = f"{report['mix']}/{report['mode']}"
+    return key + "/async" if report.get("views") == "async" else key
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_baseline(path, reports, scale):
+    """Writes the reports of a run to a JSON file to compare later runs with."""
+
+    baseline = {
+        "created": datetime.now(dt_timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "scale": scale,
+        "reports": {_report_key(report): report for report in reports},
+    }
+    with open(path, "w") as baseline_file:
+        json.dump(baseline, baseline_file, indent=2)
+
+
+def compare_baseline(path, reports, tolerance=0.25):
+    """Returns a list of regressions of the reports against a saved baseline: a p95
+      latency or a throughput more than tolerance worse, errors, or more queries
+      per request. Reports without a baseline are skipped."""
+
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)["reports"]
+
+    regressions = []
+    for report in reports:
+        key = _report_key(report)
+        old = baseline.get(key)
+        if old is None:
+            continue
+
+        if report["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {report['throughput_rps']} rps, was {old['throughput_rps']}")
+        if report["errors"] > old["errors"]:
+            regressions.append(f"{key}: {report['errors']} errors, was {old['errors']}")
+
+        for action, stats in report["actions"].items():
+            old_stats = old["actions"].get(action)
+            if old_stats is None:
+                continue
+            if stats["p95_ms"] > old_stats["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{key} {action}: p95 {stats['p95_ms']} ms, was {old_stats['p95_ms']} ms")
+            queries, old_queries = stats.get("queries_per_request"), old_stats.get("queries_per_request")
+            if queries != None and old_queries != None and queries > old_queries:
+                regressions.append(f"{key} {action}: {queries} queries per request, was {old_queries}")
+
+    return regressions
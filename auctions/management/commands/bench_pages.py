@@ -0,0 +1,85 @@
+import copy
+import gzip
+import json
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from auctions import benchmarks
+from auctions.models import Auction, Category, User
+from commerce.compression import brotli
+
+
+class Command(BaseCommand):
+    help = ("Measures the size of the main pages and the stylesheet, uncompressed and compressed, "
+            "and their render times with and without the cached template loader, on generated data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(benchmarks.SCALES), default="10k",
+            help="Size of the generated data set.")
+        parser.add_argument("--requests", type=int, default=200, help="Number of requests per page and loader.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--keepdb", action="store_true", help="Keep and reuse the benchmark database.")
+
+    def handle(self, *args, **options):
+        # the test client sends requests to the host "testserver"
+        with benchmarks.benchmark_database(options["keepdb"]), \
+                override_settings(ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ["testserver"]):
+            if not Auction.objects.exists():
+                self.stdout.write(f"Generating the {options['scale']} data set...")
+                benchmarks.generate_dataset(options["scale"], options["seed"],
+                    progress=lambda kind, created: self.stdout.write(f"  {kind} {created}", ending="\r"))
+                self.stdout.write("")
+
+            client = Client()
+            client.force_login(User.objects.order_by("id").first())
+            pages = {
+                "index": reverse("auctions:index"),
+                "categories": reverse("auctions:categories"),
+                "category": reverse("auctions:category", args=[Category.objects.order_by("id").first().id]),
+                "view_listing": reverse("auctions:view_listing", args=[Auction.objects.order_by("-id").first().id]),
+                "my_listings": reverse("auctions:my_listings"),
+            }
+
+            report = {"stylesheet": self.weight(open(finders.find("auctions/styles.css"), "rb").read())}
+            for name, url in pages.items():
+                report[name] = {
+                    **self.weight(client.get(url).content),
+                    "cached_loader": self.render_times(client, url, options["requests"]),
+                }
+                with override_settings(TEMPLATES=uncached_templates()):
+                    report[name]["uncached_loader"] = self.render_times(client, url, options["requests"])
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def weight(self, content):
+        sizes = {"bytes": len(content), "gzip_bytes": len(gzip.compress(content, compresslevel=6))}
+        if brotli != None:
+            sizes["brotli_bytes"] = len(brotli.compress(content))
+        return sizes
+
+    def render_times(self, client, url, requests):
+        # the first request fills the caches
+        if client.get(url).status_code != 200:
+            raise CommandError(f"{url} did not return a page.")
+        return benchmarks.latency_report([benchmarks.timed(client.get, url) for _ in range(requests)])
+
+
+def uncached_templates():
+    """Returns the TEMPLATES setting with the cached loader replaced by the loaders
+      it wraps, so templates are read and compiled on every render."""
+
+    templates = copy.deepcopy(settings.TEMPLATES)
+    for backend in templates:
+        loaders = []
+        for loader in backend.get("OPTIONS", {}).get("loaders", []):
+            if isinstance(loader, tuple) and loader[0] == "django.template.loaders.cached.Loader":
+                loaders.extend(loader[1])
+            else:
+                loaders.append(loader)
+        if loaders:
+            backend["OPTIONS"]["loaders"] = loaders
+    return templates
@@ -0,0 +1,63 @@
+import json
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from auctions import benchmarks
+from auctions.bidding import place_bid, place_proxy_bid, PROXY_OUTBID
+from auctions.models import Auction, Category
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks proxy bidding: times bids and new maximums on one auction with thousands of competing "
+            "proxy bids, in a separate test database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--proxies", type=int, default=5000, help="Number of competing proxy bids.")
+        parser.add_argument("--bids", type=int, default=1000,
+            help="Number of incoming bids to time, every other one sets a new maximum.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with benchmarks.benchmark_database():
+            users = benchmarks.generate_users(options["proxies"] + 1, options["seed"])
+            auction = Auction.objects.create(title="Contested listing", description="", starting_bid=Decimal(10),
+                current_price=Decimal(10), creator=users[0], category=Category.objects.create(name="Benchmark"))
+            spread = Decimal(options["proxies"]) / 10
+            benchmarks.generate_proxy_bids(auction, users[1:], options["seed"], spread)
+            self.stdout.write(f"Generated {options['proxies']} proxy bids with maximums up to {10 + spread}.")
+
+            generator = random.Random(options["seed"])
+            samples = {"bid": [], "proxy": []}
+            queries = {"bid": 0, "proxy": 0}
+            answered = 0
+            for i in range(options["bids"]):
+                kind = "proxy" if i % 2 else "bid"
+                bidder = generator.choice(users[1:])
+                auction.refresh_from_db(fields=["current_price"])
+                amount = auction.current_price + Decimal(generator.randint(100, 2000 if i % 2 else 500)) / 100
+
+                with CaptureQueriesContext(connection) as captured:
+                    if kind == "proxy":
+                        samples[kind].append(benchmarks.timed(place_proxy_bid, auction, bidder, amount))
+                    else:
+                        result = []
+                        samples[kind].append(benchmarks.timed(lambda: result.append(
+                            place_bid(auction, bidder, amount))))
+                        answered += result[0].outcome == PROXY_OUTBID
+                queries[kind] += len(captured)
+
+            auction.refresh_from_db()
+            report = {
+                "proxies": options["proxies"],
+                "final_price": str(auction.current_price),
+                "bids_placed": auction.bid_count,
+                "bids_answered_by_proxies": answered,
+            }
+            for kind, kind_samples in samples.items():
+                report[kind] = dict(benchmarks.latency_report(kind_samples),
+                    queries_per_call=round(queries[kind] / max(len(kind_samples), 1), 2))
+            self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,52 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+
+from auctions import benchmarks
+from auctions.models import Auction
+from auctions.search import search_listings, ACTIVE, ALL
+
+
+class Command(BaseCommand):
+    help = "Benchmarks full-text search over synthetic listings in a separate test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=1000000, help="Number of listings to generate.")
+        parser.add_argument("--queries", type=int, default=1000, help="Number of searches to time.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--keepdb", action="store_true", help="Keep and reuse the benchmark database.")
+
+    def handle(self, *args, **options):
+        with benchmarks.benchmark_database(options["keepdb"]):
+            words = benchmarks.vocabulary(5000, options["seed"])
+
+            if Auction.objects.count() < options["listings"]:
+                self.stdout.write(f"Generating {options['listings']} listings...")
+                users = benchmarks.generate_users(1000, options["seed"])
+                categories = benchmarks.generate_categories(30, options["seed"])
+                benchmarks.generate_auctions(options["listings"], users, categories, options["seed"], words,
+                    progress=lambda created: self.stdout.write(f"  {created}", ending="\r"))
+                self.stdout.write("")
+                categories = [category.id for category in categories]
+            else:
+                categories = list(Auction.objects.values_list("category_id", flat=True).distinct())
+
+            generator = random.Random(options["seed"])
+            samples = []
+            for i in range(options["queries"]):
+                query = " ".join(benchmarks.pick_words(generator, words, generator.randint(1, 2)))
+                filters = {}
+                if i % 2:
+                    filters["category"] = generator.choice(categories)
+                if i % 3 == 0:
+                    filters["min_price"] = generator.randint(0, 5000)
+                    filters["max_price"] = filters["min_price"] + generator.randint(100, 5000)
+                filters["status"] = ACTIVE if i % 4 else ALL
+                if i % 5 == 0:
+                    # every fifth search asks for the second page
+                    filters["cursor"] = search_listings(query, **filters).next_cursor
+                samples.append(benchmarks.timed(search_listings, query, **filters))
+
+            report = {"listings": options["listings"], **benchmarks.latency_report(samples)}
+            self.stdout.write(json.dumps(report, indent=2))
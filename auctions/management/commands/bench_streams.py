@@ -0,0 +1,76 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from auctions import benchmarks
+from auctions.streams import Broker
+
+
+class Command(BaseCommand):
+    help = "Measures how fast listing events reach many idle stream subscribers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=20000, help="Number of simulated subscribers.")
+        parser.add_argument("--listings", type=int, default=10, help="Number of listings they watch.")
+        parser.add_argument("--events", type=int, default=50, help="Number of events to publish.")
+
+    def handle(self, *args, **options):
+        report = asyncio.run(self.run(options["subscribers"], options["listings"], options["events"]))
+        self.stdout.write(json.dumps(report, indent=2))
+
+    async def run(self, subscriber_count, listing_count, event_count):
+        broker = Broker()
+        received = {}
+        delivered = asyncio.Event()
+        pending = [0]
+
+        async def subscriber(listing):
+            subscription = broker.subscribe(listing)
+            try:
+                while True:
+                    for event in await subscription.get():
+                        received.setdefault(event.data["event"], []).append(time.perf_counter())
+                        pending[0] -= 1
+                        if pending[0] == 0:
+                            delivered.set()
+            finally:
+                subscription.close()
+
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(subscriber(i % listing_count)) for i in range(subscriber_count)]
+        while broker.subscriber_count() < subscriber_count:
+            await asyncio.sleep(0.01)
+        subscribe_time = time.perf_counter() - started
+
+        # events are published from another thread, like a bid coming in through a
+        # synchronous view
+        loop = asyncio.get_running_loop()
+        first_delivery, last_delivery = [], []
+        for number in range(event_count):
+            listing = number % listing_count
+            pending[0] = sum(1 for i in range(subscriber_count) if i % listing_count == listing)
+            delivered.clear()
+            published = []
+            publisher = threading.Thread(target=lambda: (
+                published.append(time.perf_counter()),
+                broker.publish(listing, "bid", {"event": number})))
+            await loop.run_in_executor(None, publisher.run)
+            await delivered.wait()
+            times = received.pop(number)
+            first_delivery.append(min(times) - published[0])
+            last_delivery.append(max(times) - published[0])
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        return {
+            "subscribers": subscriber_count,
+            "subscribers_per_listing": subscriber_count // listing_count,
+            "subscribe_all_ms": round(1000 * subscribe_time, 3),
+            "first_subscriber": benchmarks.latency_report(first_delivery),
+            "last_subscriber": benchmarks.latency_report(last_delivery),
+        }
@@ -0,0 +1,63 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from auctions import benchmarks
+from auctions.models import Auction
+from commerce.throttling import check_rate
+
+
+# rates so high that every request of the benchmark is allowed, but still checked
+UNREACHABLE_RATES = {"user": "1000000000/m", "ip": "1000000000/m"}
+
+
+class Command(BaseCommand):
+    help = ("Measures the cost of the rate limits: checks per second in the cache, and the latency of "
+            "allowed comment posts with and without limits and of rejected ones.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000, help="Number of posts per configuration.")
+        parser.add_argument("--checks", type=int, default=20000, help="Number of rate checks to time.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        # the test client sends requests to the host "testserver"
+        with benchmarks.benchmark_database(), \
+                override_settings(ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ["testserver"]):
+            users = benchmarks.generate_users(10, options["seed"])
+            categories = benchmarks.generate_categories(1, options["seed"])
+            benchmarks.generate_auctions(10, users, categories, options["seed"])
+            cache.clear()
+
+            identities = [{"user": str(i % 1000), "ip": f"10.0.{i % 256}.{i // 256 % 256}"}
+                          for i in range(options["checks"])]
+            duration = sum(benchmarks.timed(check_rate, "auctions:comment", UNREACHABLE_RATES, identity)
+                           for identity in identities)
+            report = {"checks_per_second": round(options["checks"] / duration, 1)}
+
+            client = Client()
+            client.force_login(users[0])
+            url = reverse("auctions:comment", args=[Auction.objects.order_by("id").first().id])
+            configurations = {
+                "unlimited": {},
+                "allowed": {"auctions:comment": UNREACHABLE_RATES},
+                "rejected": {"auctions:comment": {"user": "1/d"}},
+            }
+            samples = {name: [] for name in configurations}
+            # Django logs a warning for every rejected request
+            logging.getLogger("django.request").setLevel(logging.ERROR)
+            # alternate between the configurations, so they see the same conditions
+            for i in range(options["requests"]):
+                for name, limits in configurations.items():
+                    with override_settings(RATE_LIMITS=limits):
+                        samples[name].append(benchmarks.timed(client.post, url, {"content": f"Comment {i}"}))
+            for name, latencies in samples.items():
+                report[name] = benchmarks.latency_report(latencies)
+                report[name]["requests_per_second"] = round(len(latencies) / sum(latencies), 1)
+
+        self.stdout.write(json.dumps(report, indent=2))
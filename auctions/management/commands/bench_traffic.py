@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions import benchmarks, loadtest
+from auctions.models import Auction
+
+
+class Command(BaseCommand):
+    help = ("Runs traffic mixes against the auctions views on generated data and reports throughput, "
+            "latency percentiles and queries per request, optionally against a saved baseline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(benchmarks.SCALES), default="10k",
+            help="Size of the generated data set.")
+        parser.add_argument("--mix", choices=sorted(loadtest.MIXES) + ["all"], default="all",
+            help="Traffic mix to run.")
+        parser.add_argument("--mode", choices=loadtest.MODES, default="client",
+            help="How requests are sent, see loadtest.MODES. Compare the async listing views with the "
+                 "synchronous ones in the asgi mode, with and without ASYNC_VIEWS=1.")
+        parser.add_argument("--url", help="Server to send requests to in the url mode, it must use the "
+            "configured database, no data is generated, and run with RATE_LIMITING=0.")
+        parser.add_argument("--requests", type=int, default=1000, help="Number of requests per mix.")
+        parser.add_argument("--concurrency", type=int, default=4, help="Number of concurrent workers.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--keepdb", action="store_true", help="Keep and reuse the benchmark database.")
+        parser.add_argument("--save-baseline", metavar="PATH", help="Write the results to a JSON file.")
+        parser.add_argument("--compare", metavar="PATH", help="Fail if the results regressed against a "
+            "JSON file written by --save-baseline.")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+            help="Allowed fraction of latency and throughput regression, defaults to 0.25.")
+
+    def handle(self, *args, **options):
+        if options["mode"] == "url":
+            if not options["url"]:
+                raise CommandError("The url mode needs --url.")
+            reports = self.run_mixes(options)
+        else:
+            with benchmarks.benchmark_database(options["keepdb"], on_disk=True):
+                if not Auction.objects.exists():
+                    self.stdout.write(f"Generating the {options['scale']} data set...")
+                    benchmarks.generate_dataset(options["scale"], options["seed"],
+                        progress=lambda kind, created: self.stdout.write(f"  {kind} {created}", ending="\r"))
+                    self.stdout.write("")
+                reports = self.run_mixes(options)
+
+        self.stdout.write(json.dumps(reports, indent=2))
+
+        if options["save_baseline"]:
+            loadtest.save_baseline(options["save_baseline"], reports, options["scale"])
+        if options["compare"]:
+            regressions = loadtest.compare_baseline(options["compare"], reports, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write("No regressions against the baseline.")
+
+    def run_mixes(self, options):
+        mixes = sorted(loadtest.MIXES) if options["mix"] == "all" else [options["mix"]]
+        return [loadtest.run_traffic(mix, options["mode"], options["requests"], options["concurrency"],
+                                     options["seed"], options["url"]) for mix in mixes]
@@ -0,0 +1,120 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from auctions import benchmarks
+from auctions.bidding import place_bid
+from auctions.models import Auction, Comment
+from auctions.writes import run_write, write_queue
+
+
+# environment of every configuration that is compared, see commerce.databases
+PROFILES = {
+    "default": {"SQLITE_PROFILE": "default", "WRITE_QUEUE": "0"},
+    "default+queue": {"SQLITE_PROFILE": "default", "WRITE_QUEUE": "1"},
+    "performance": {"SQLITE_PROFILE": "performance", "WRITE_QUEUE": "0"},
+    "performance+queue": {"SQLITE_PROFILE": "performance", "WRITE_QUEUE": "1"},
+}
+
+# number of auctions the bids and comments go to
+HOT_AUCTIONS = 10
+
+
+class Command(BaseCommand):
+    help = ("Compares how many bids and comments per second concurrent threads write to an SQLite database "
+            "file with the default settings, the performance profile and the write queue. Writes go through "
+            "the same functions as views.bid and views.comment, without the rest of the request.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writes", type=int, default=4000, help="Number of writes per profile.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Number of writing threads.")
+        parser.add_argument("--profile", action="append", choices=sorted(PROFILES),
+            help="Profile to run, can be repeated, defaults to all.")
+        parser.add_argument("--in-process", action="store_true",
+            help="Run with the settings of this process and print the report as JSON.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark compares SQLite settings, DATABASE_URL is not an SQLite database.")
+
+        if options["in_process"]:
+            self.stdout.write(json.dumps(self.run_writes(options["writes"], options["concurrency"])))
+            return
+
+        self.stdout.write(f"{'profile':<20}{'writes/s':>10}{'commits':>9}{'errors':>8}"
+                          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for profile in options["profile"] or PROFILES:
+            report = self.run_profile(profile, options)
+            latency = report["latency"]
+            self.stdout.write(f"{profile:<20}{report['writes_per_second']:>10.1f}{report['commits']:>9}"
+                f"{report['errors']:>8}{latency['p50_ms']:>9.2f}{latency['p95_ms']:>9.2f}{latency['p99_ms']:>9.2f}")
+
+    def run_profile(self, profile, options):
+        """Runs the writes in a new process, which reads the profile from its
+          environment when the settings are loaded, and returns its report."""
+
+        command = [sys.executable, os.path.join(settings.BASE_DIR, "manage.py"), "bench_writes", "--in-process",
+            "--writes", str(options["writes"]), "--concurrency", str(options["concurrency"])]
+        result = subprocess.run(command, env={**os.environ, **PROFILES[profile]}, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(f"The {profile} profile failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def run_writes(self, writes, concurrency):
+        """Places bids (70%) and comments (30%) on a few auctions from concurrent
+          threads and returns the throughput, the latency of a write and the number
+          of commits."""
+
+        with benchmarks.benchmark_database(on_disk=True):
+            users = benchmarks.generate_users(concurrency)
+            categories = benchmarks.generate_categories(2)
+            benchmarks.generate_auctions(HOT_AUCTIONS, users, categories)
+            auctions = list(Auction.objects.all())
+
+            amounts = (Decimal(1000) + step for step in range(writes))
+            amounts_lock = threading.Lock()
+            latencies, errors = [], []
+            transactions = write_queue.transactions
+
+            def write(user, seed):
+                generator = random.Random(seed)
+                for _ in range(writes // concurrency):
+                    auction = generator.choice(auctions)
+                    start = time.perf_counter()
+                    try:
+                        if generator.random() < 0.7:
+                            with amounts_lock:
+                                amount = next(amounts)
+                            run_write(place_bid, auction, user, amount)
+                        else:
+                            run_write(Comment(comment_content="Benchmark comment", creator=user, auction=auction).save)
+                    except Exception as error:
+                        errors.append(error)
+                    latencies.append(time.perf_counter() - start)
+                connections.close_all()
+
+            threads = [threading.Thread(target=write, args=(user, seed)) for seed, user in enumerate(users)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            duration = time.perf_counter() - start
+
+        committed = len(latencies) - len(errors)
+        return {
+            "writes_per_second": round(committed / duration, 1),
+            # without the queue every write commits on its own
+            "commits": write_queue.transactions - transactions if settings.WRITE_QUEUE else committed,
+            "errors": len(errors),
+            "latency": benchmarks.latency_report(latencies),
+        }
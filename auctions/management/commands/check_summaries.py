@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.feeds import active_feed_page
+from auctions.summaries import check_summaries, refresh_summaries, SUMMARY_BATCH_SIZE
+
+
+# number of differing listings that are listed one by one, the others are only counted
+MAX_REPORTED_LISTINGS = 20
+
+
+class Command(BaseCommand):
+    help = ("Compares the listing summaries with the auctions they were copied from and fails "
+            "if they differ, e.g. as a periodic job.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true",
+            help="Refresh the summaries that differ instead of failing.")
+        parser.add_argument("--batch-size", type=int, default=SUMMARY_BATCH_SIZE,
+            help="Number of auctions compared at a time.")
+
+    def handle(self, *args, **options):
+        report = check_summaries(options["batch_size"])
+        if report.consistent:
+            self.stdout.write(f"Checked {report.checked} listings, all summaries are up to date.")
+            return
+
+        for pk in report.missing[:MAX_REPORTED_LISTINGS]:
+            self.stderr.write(f"Listing {pk}: no summary.")
+        for pk, fields in list(report.stale.items())[:MAX_REPORTED_LISTINGS]:
+            differences = ", ".join(f"{field} is {summary!r} instead of {auction!r}"
+                                    for field, (summary, auction) in fields.items())
+            self.stderr.write(f"Listing {pk}: {differences}.")
+        for pk in report.orphaned[:MAX_REPORTED_LISTINGS]:
+            self.stderr.write(f"Summary {pk}: no listing.")
+
+        summary = (f"{len(report.missing)} missing, {len(report.stale)} stale and {len(report.orphaned)} "
+                   f"orphaned summaries of {report.checked} listings")
+        if not options["fix"]:
+            raise CommandError(f"Found {summary}, run with --fix or rebuild_summaries to repair them.")
+
+        refresh_summaries(report.missing + list(report.stale) + report.orphaned)
+        active_feed_page.invalidate()
+        self.stdout.write(f"Fixed {summary}.")
@@ -0,0 +1,60 @@
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+from django.utils import timezone
+
+from auctions.cache_backends import LOCAL_CACHES
+from auctions.closing import close_expired, next_expiry, CLOSE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ("Closes auctions whose end time has passed, in batches, until stopped. Needs a cache shared "
+            "with the web server, e.g. CACHE_BACKEND=redis or file, so their cached pages are invalidated.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=5,
+            help="Longest time in seconds between two checks for expired auctions.")
+        parser.add_argument("--batch-size", type=int, default=CLOSE_BATCH_SIZE,
+            help="Number of auctions closed by one update.")
+        parser.add_argument("--once", action="store_true",
+            help="Close the auctions that have expired now and stop.")
+
+    def handle(self, *args, **options):
+        if isinstance(caches["default"], LOCAL_CACHES):
+            raise CommandError(f"The {type(caches['default']).__name__} cache lives in this process, so the web server would "
+                               "keep showing closed auctions as active. Use a shared cache, e.g. CACHE_BACKEND=redis.")
+
+        while True:
+            closed = self.close_all(options["batch_size"])
+            if closed:
+                self.stdout.write(f"Closed {closed} auctions.")
+            if options["once"]:
+                return
+
+            # sleep until the next auction ends, but check at least every interval
+            # for auctions that were created with a short duration meanwhile
+            delay = options["interval"]
+            ends_at = next_expiry()
+            if ends_at is not None:
+                delay = min(delay, max((ends_at - timezone.now()).total_seconds(), 0.1))
+            time.sleep(delay)
+
+    def close_all(self, batch_size):
+        """Closes batches until no expired auction is left and returns the total."""
+
+        total = 0
+        while True:
+            try:
+                closed = close_expired(batch_size=batch_size)
+            except OperationalError as error:
+                # SQLite refuses the update while bids are being written, the
+                # auctions are picked up again in the next round
+                if "locked" not in str(error):
+                    raise
+                self.stderr.write(f"Database locked, retrying: {error}")
+                return total
+            total += closed
+            if closed < batch_size:
+                return total
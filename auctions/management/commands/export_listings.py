@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from auctions.catalogue import FORMATS, JSONL, export_listings
+from auctions.models import Auction
+
+
+class Command(BaseCommand):
+    help = "Writes the auctions with their bids as CSV or JSON Lines, loading them in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default=JSONL)
+        parser.add_argument("--output", default="-", help="File to write, - for standard output.")
+        parser.add_argument("--user", help="Only export the auctions created by this username.")
+        parser.add_argument("--active", action="store_true", help="Only export active auctions.")
+
+    def handle(self, *args, **options):
+        auctions = Auction.objects.all()
+        if options["user"]:
+            auctions = auctions.filter(creator__username=options["user"])
+        if options["active"]:
+            auctions = auctions.filter(is_active=True)
+
+        output = sys.stdout if options["output"] == "-" else open(options["output"], "w", encoding="utf-8", newline="")
+        try:
+            for line in export_listings(auctions, options["format"]):
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
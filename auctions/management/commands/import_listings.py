@@ -0,0 +1,42 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.catalogue import FORMATS, IMPORT_BATCH_SIZE, import_listings, read_rows, text_stream
+from auctions.models import User
+
+
+class Command(BaseCommand):
+    help = ("Creates listings from a CSV file with a header or a JSON Lines file, e.g. a catalogue written by "
+            "export_listings. The file is read as a stream and invalid rows are reported and skipped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, - for standard input.")
+        parser.add_argument("--user", required=True, help="Username of the creator of the listings.")
+        parser.add_argument("--format", choices=FORMATS,
+            help="Format of the file, by default taken from its extension.")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+            help="Number of listings inserted by one query.")
+
+    def handle(self, *args, **options):
+        try:
+            creator = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']}.")
+
+        format = options["format"] or os.path.splitext(options["path"])[1].lstrip(".").lower()
+        if format not in FORMATS:
+            raise CommandError("Use --format to give the format of the file.")
+
+        def report_error(error):
+            self.stderr.write(f"Line {error.line}: {error.errors}")
+
+        if options["path"] == "-":
+            stream = text_stream(sys.stdin.buffer)
+        else:
+            stream = open(options["path"], encoding="utf-8-sig", newline="")
+        with stream:
+            report = import_listings(read_rows(stream, format), creator, options["batch_size"], report_error)
+
+        self.stdout.write(f"Created {report.created} listings, skipped {report.skipped} rows.")
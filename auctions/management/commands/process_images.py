@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from auctions.images import ImageError, process_listing_image
+from auctions.models import Auction
+
+
+class Command(BaseCommand):
+    help = ("Fetches the images of listings that have no thumbnail yet and stores their thumbnails, "
+            "e.g. for imported listings or images that could not be fetched when they were created.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("listings", nargs="*", type=int,
+            help="Ids of the listings to process, by default all listings without thumbnail.")
+
+    def handle(self, *args, **options):
+        listings = Auction.objects.exclude(image=None).exclude(image="")
+        if options["listings"]:
+            listings = listings.filter(pk__in=options["listings"])
+        else:
+            listings = listings.filter(thumbnail="")
+
+        processed = failed = 0
+        for listing in listings.order_by("id").values_list("id", flat=True).iterator():
+            try:
+                process_listing_image(listing)
+                processed += 1
+            except ImageError as error:
+                failed += 1
+                self.stderr.write(f"Listing {listing}: {error}")
+
+        self.stdout.write(f"Processed {processed} images, {failed} failed.")
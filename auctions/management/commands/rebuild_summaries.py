@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from auctions.feeds import active_feed_page
+from auctions.summaries import rebuild_summaries, SUMMARY_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ("Builds the listing summaries that feeds read again from the auctions, e.g. after "
+            "changing auctions outside the app or when check_summaries finds differences.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SUMMARY_BATCH_SIZE,
+            help="Number of summaries inserted at a time.")
+
+    def handle(self, *args, **options):
+        written = rebuild_summaries(options["batch_size"],
+            progress=lambda written: self.stdout.write(f"Summarized {written} listings..."))
+        active_feed_page.invalidate()
+        self.stdout.write(f"Rebuilt {written} listing summaries.")
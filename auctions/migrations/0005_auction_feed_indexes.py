@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:21
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_current_price(apps, schema_editor):
+    """Sets the current price of listings that have none to their starting bid,
+      so every listing has a price to sort and paginate on."""
+
+    Auction = apps.get_model("auctions", "Auction")
+    Auction.objects.filter(current_price=None).update(current_price=F("starting_bid"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0004_auction_won_by'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_current_price, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auction',
+            index=models.Index(fields=['is_active', '-id'], name='auction_active_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auction',
+            index=models.Index(fields=['is_active', 'current_price', 'id'], name='auction_active_price_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:22
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_bid_summary(apps, schema_editor):
+    """Fills the bid summary of existing auctions from their bids in one
+      set-based update."""
+
+    Auction = apps.get_model("auctions", "Auction")
+    Bid = apps.get_model("auctions", "Bid")
+
+    highest = Bid.objects.filter(auction=OuterRef("pk")).order_by("-amount", "-id")
+    count = (Bid.objects.filter(auction=OuterRef("pk")).order_by()
+        .values("auction").annotate(count=Count("id")).values("count"))
+
+    Auction.objects.filter(pk__in=Bid.objects.values("auction")).update(
+        highest_bid=Subquery(highest.values("amount")[:1]),
+        highest_bidder=Subquery(highest.values("creator")[:1]),
+        bid_count=Subquery(count))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0005_auction_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auction',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='auction',
+            name='highest_bid',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='auction',
+            name='highest_bidder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leading_auctions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_bid_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+from django.db import migrations
+
+
+# tokens describing the category and status of an auction row, they are indexed in
+# the tags column so search filters are answered by the full-text index itself
+SQLITE_TAGS = "'c' || coalesce({row}.category_id, 0) || CASE WHEN {row}.is_active THEN ' open' ELSE ' closed' END"
+
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE auctions_auction_fts USING fts5(
+        title, description, tags, content='',
+        tokenize='porter unicode61', prefix='2 3 4 5')""",
+    f"""CREATE TRIGGER auctions_auction_fts_insert AFTER INSERT ON auctions_auction BEGIN
+        INSERT INTO auctions_auction_fts(rowid, title, description, tags)
+        VALUES (new.id, new.title, new.description, {SQLITE_TAGS.format(row="new")});
+    END""",
+    f"""CREATE TRIGGER auctions_auction_fts_delete AFTER DELETE ON auctions_auction BEGIN
+        INSERT INTO auctions_auction_fts(auctions_auction_fts, rowid, title, description, tags)
+        VALUES ('delete', old.id, old.title, old.description, {SQLITE_TAGS.format(row="old")});
+    END""",
+    f"""CREATE TRIGGER auctions_auction_fts_update
+        AFTER UPDATE OF title, description, category_id, is_active ON auctions_auction BEGIN
+        INSERT INTO auctions_auction_fts(auctions_auction_fts, rowid, title, description, tags)
+        VALUES ('delete', old.id, old.title, old.description, {SQLITE_TAGS.format(row="old")});
+        INSERT INTO auctions_auction_fts(rowid, title, description, tags)
+        VALUES (new.id, new.title, new.description, {SQLITE_TAGS.format(row="new")});
+    END""",
+    f"""INSERT INTO auctions_auction_fts(rowid, title, description, tags)
+        SELECT id, title, description, {SQLITE_TAGS.format(row="auctions_auction")} FROM auctions_auction""",
+]
+
+# SQLite drops the triggers when Django rebuilds the auction table, e.g. to add a
+# column with a default, so such migrations create them again, see 0009
+SQLITE_TRIGGERS = SQLITE_FORWARD[1:4]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER auctions_auction_fts_update",
+    "DROP TRIGGER auctions_auction_fts_delete",
+    "DROP TRIGGER auctions_auction_fts_insert",
+    "DROP TABLE auctions_auction_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    """ALTER TABLE auctions_auction ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED""",
+    "CREATE INDEX auctions_auction_search_idx ON auctions_auction USING GIN (search_vector)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX auctions_auction_search_idx",
+    "ALTER TABLE auctions_auction DROP COLUMN search_vector",
+]
+
+
+def run_statements(statements):
+    """Returns a migration function running the statements for the database vendor."""
+
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    """Adds the full-text index used by search.search_listings: a contentless FTS5
+      table kept in sync by triggers on SQLite and a generated tsvector column on
+      PostgreSQL.
+      The index is not part of the Auction model, so other databases skip it."""
+
+    dependencies = [
+        ('auctions', '0006_auction_bid_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRESQL_FORWARD}),
+            run_statements({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRESQL_BACKWARD})),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0007_auction_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auction',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='auction',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['ends_at'], name='auction_active_ends_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:31
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+search_index = import_module("auctions.migrations.0007_auction_search_index")
+
+
+def backfill_watcher_count(apps, schema_editor):
+    """Counts the watchers of existing auctions in one set-based update."""
+
+    Auction = apps.get_model("auctions", "Auction")
+    Watch = apps.get_model("auctions", "User").watchlist.through
+
+    count = (Watch.objects.filter(auction=OuterRef("pk")).order_by()
+        .values("auction").annotate(count=Count("id")).values("count"))
+
+    Auction.objects.filter(pk__in=Watch.objects.values("auction")).update(watcher_count=Subquery(count))
+
+
+def restore_search_triggers(apps, schema_editor):
+    """Creates the full-text index triggers of migration 0007 again, SQLite drops
+      them when the auction table is rebuilt to add or remove the column."""
+
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in search_index.SQLITE_TRIGGERS:
+        schema_editor.execute(statement.replace("CREATE TRIGGER", "CREATE TRIGGER IF NOT EXISTS", 1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0008_auction_ends_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='auction',
+            name='watcher_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_watcher_count, migrations.RunPython.noop),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
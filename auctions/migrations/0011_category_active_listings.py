@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_active_listings(apps, schema_editor):
+    """Counts the active auctions of existing categories in one set-based update."""
+
+    Auction = apps.get_model("auctions", "Auction")
+    Category = apps.get_model("auctions", "Category")
+
+    count = (Auction.objects.filter(category=OuterRef("pk"), is_active=True).order_by()
+        .values("category").annotate(count=Count("id")).values("count"))
+
+    Category.objects.filter(pk__in=Auction.objects.filter(is_active=True).values("category")).update(
+        active_listings=Subquery(count))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0010_bid_comment_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_listings',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_active_listings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:03
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+
+restore_search_triggers = import_module("auctions.migrations.0009_auction_watcher_count").restore_search_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0011_category_active_listings'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='auction',
+            name='detail_image',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='auction',
+            name='thumbnail',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
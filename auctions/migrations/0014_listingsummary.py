@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    """Copies the existing auctions to their summaries with one insert per batch."""
+
+    Auction = apps.get_model("auctions", "Auction")
+    ListingSummary = apps.get_model("auctions", "ListingSummary")
+
+    auctions = (Auction.objects.select_related("creator", "category").order_by("id")
+        .iterator(chunk_size=1000))
+    ListingSummary.objects.bulk_create((ListingSummary(
+        id=auction.id, title=auction.title, current_price=auction.current_price,
+        creator_id=auction.creator_id, creator_name=auction.creator.username,
+        category_id=auction.category_id, category_name=auction.category.name if auction.category_id else "",
+        thumbnail=auction.thumbnail, bid_count=auction.bid_count, ends_at=auction.ends_at,
+        is_active=auction.is_active) for auction in auctions), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0013_proxybid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingSummary',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=100)),
+                ('current_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('creator_id', models.IntegerField()),
+                ('creator_name', models.CharField(max_length=150)),
+                ('category_id', models.IntegerField(blank=True, null=True)),
+                ('category_name', models.CharField(blank=True, default='', max_length=100)),
+                ('thumbnail', models.CharField(blank=True, default='', max_length=100)),
+                ('bid_count', models.PositiveIntegerField(default=0)),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('is_active', True)), fields=['-id'], name='summary_active_newest_idx'), models.Index(condition=models.Q(('is_active', True)), fields=['current_price', 'id'], name='summary_active_price_idx'), models.Index(condition=models.Q(('is_active', True)), fields=['category_id', '-id'], name='summary_category_newest_idx'), models.Index(condition=models.Q(('is_active', True)), fields=['category_id', 'current_price', 'id'], name='summary_category_price_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -10,6 +11,8 @@ class User(AbstractUser):
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
+    # number of active auctions in the category, kept up to date by categories.count_listings
+    active_listings = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.name}"
@@ -22,8 +25,61 @@ class Auction(models.Model):
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name="auctions")
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, related_name="category_auctions", null=True, blank=True)
     image = models.URLField(null=True, blank=True)
+    # names of the stored renditions of the image, see images.process_listing_image
+    thumbnail = models.CharField(max_length=100, blank=True, default="")
+    detail_image = models.CharField(max_length=100, blank=True, default="")
     is_active = models.BooleanField(default=True)
     won_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="won_auctions", null=True, blank=True)
+    # when the auction closes by itself, see closing.close_expired, never if None
+    ends_at = models.DateTimeField(null=True, blank=True)
+
+    # summary of the bids on this auction, kept up to date by bidding.place_bid
+    highest_bid = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    highest_bidder = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="leading_auctions", null=True, blank=True)
+    bid_count = models.PositiveIntegerField(default=0)
+    # number of users with the auction on their watchlist, kept up to date by signals.watchlist_changed
+    watcher_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # one index per feed sort order, see feeds.SORT_ORDERS
+        indexes = [
+            models.Index(fields=["is_active", "-id"], name="auction_active_newest_idx"),
+            models.Index(fields=["is_active", "current_price", "id"], name="auction_active_price_idx"),
+            # only active auctions can expire, so only they are indexed by end time
+            models.Index(fields=["ends_at"], condition=models.Q(is_active=True), name="auction_active_ends_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.title}"
+
+# the columns of an auction that listing feeds show, with the names of its creator and
+# category, so feeds read one table without joins, kept up to date by summaries.refresh_summaries
+class ListingSummary(models.Model):
+    # the id of the auction
+    id = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=100)
+    current_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    creator_id = models.IntegerField()
+    creator_name = models.CharField(max_length=150)
+    category_id = models.IntegerField(null=True, blank=True)
+    category_name = models.CharField(max_length=100, blank=True, default="")
+    thumbnail = models.CharField(max_length=100, blank=True, default="")
+    bid_count = models.PositiveIntegerField(default=0)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        # one index per feed and sort order, see feeds.SORT_ORDERS, only over the active
+        # listings that the feeds show, which also lets SQLite match "WHERE is_active"
+        indexes = [
+            models.Index(fields=["-id"], condition=models.Q(is_active=True), name="summary_active_newest_idx"),
+            models.Index(fields=["current_price", "id"], condition=models.Q(is_active=True),
+                name="summary_active_price_idx"),
+            models.Index(fields=["category_id", "-id"], condition=models.Q(is_active=True),
+                name="summary_category_newest_idx"),
+            models.Index(fields=["category_id", "current_price", "id"], condition=models.Q(is_active=True),
+                name="summary_category_price_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title}"
@@ -32,14 +88,51 @@ class Bid(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name="current_bids")
     auction = models.ForeignKey(Auction, on_delete=models.CASCADE, related_name="auction_bids")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # the bid history of a listing, newest first, see history.bid_history
+            models.Index(fields=["auction", "created_at", "id"], name="bid_auction_created_idx"),
+            # the highest bids of a listing, e.g. to rebuild the bid summary like migration 0006
+            models.Index(fields=["auction", "amount"], name="bid_auction_amount_idx"),
+        ]
 
     def __str__(self):
         return f"Bid made by {self.creator.username} on {self.auction.title}"
 
+class ProxyBid(models.Model):
+    # the most the bidder will pay, bidding.place_proxy_bid bids for the bidder up to
+    # it, only shown to the bidder
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    bidder = models.ForeignKey(User, on_delete=models.CASCADE, related_name="proxy_bids")
+    auction = models.ForeignKey(Auction, on_delete=models.CASCADE, related_name="proxy_bids")
+    # when the maximum was last set, the earlier of two equal maximums wins
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["auction", "bidder"], name="proxy_bid_auction_bidder_unique"),
+        ]
+        indexes = [
+            # the two highest maximums of a listing, see bidding.resolve_proxy_bids
+            models.Index(fields=["auction", "-max_amount", "created_at"], name="proxy_bid_auction_max_idx"),
+        ]
+
+    def __str__(self):
+        return f"Proxy bid of {self.bidder.username} on {self.auction.title}"
+
 class Comment(models.Model):
     comment_content = models.CharField(max_length=1000)
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name="user_comments")
     auction = models.ForeignKey(Auction, on_delete=models.CASCADE, related_name="comments")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # the comments of a listing, newest first, see history.comment_history
+            models.Index(fields=["auction", "created_at", "id"], name="comment_auction_created_idx"),
+        ]
 
     def __str__(self):
         return f"Comment made by {self.creator.username} on {self.auction.title}"
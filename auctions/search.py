@@ -0,0 +1,210 @@
+import re
+
+from django.db import connection
+
+from .feeds import listing_feed
+from .models import Auction, ListingSummary
+
+
+SEARCH_PAGE_SIZE = 25
+
+# statuses a search can be limited to
+ACTIVE = "active"
+CLOSED = "closed"
+ALL = "all"
+
+# results are ranked in tiers, listings with every word in the title come first,
+# then listings with the words anywhere, each tier newest first
+TITLE_TIER = 1
+ANY_TIER = 2
+
+# prefix lengths the full-text index keeps, see migration 0007, longer words are
+# matched exactly (after stemming) because expanding them scans the index
+MAX_PREFIX = 5
+
+# words of a search query, everything else is dropped so users can not inject
+# full-text query syntax
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class SearchPage:
+    """A page of search results. Attributes:
+      - items(list): The ListingSummaries of the matching auctions on this page, best
+        match first.
+      - next_cursor(string): Token for the following page, None on the last page."""
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def decode_cursor(cursor):
+    """Returns the (tier, id) pair of a search cursor, or the start of the first
+      tier if the cursor is missing or malformed."""
+
+    try:
+        tier, before = (int(part) for part in cursor.split(":"))
+    except (AttributeError, ValueError):
+        return TITLE_TIER, None
+
+    if tier not in (TITLE_TIER, ANY_TIER):
+        return TITLE_TIER, None
+    return tier, before
+
+
+def _price_conditions(min_price, max_price):
+    """Returns SQL conditions on the auction table "a" for a price range and their parameters."""
+
+    conditions, params = [], []
+    if min_price is not None:
+        conditions.append("a.current_price >= %s")
+        params.append(str(min_price))
+    if max_price is not None:
+        conditions.append("a.current_price <= %s")
+        params.append(str(max_price))
+    return conditions, params
+
+
+def _sqlite_ids(words, tier, before, limit, status, category, min_price, max_price):
+    # every word must match, the last one may be the start of a word
+    phrases = " ".join(f'"{word}"' for word in words)
+    if 1 < len(words[-1]) <= MAX_PREFIX:
+        phrases += "*"
+
+    if tier == TITLE_TIER:
+        match = f"(title : ({phrases}))"
+    else:
+        match = f"({{title description}} : ({phrases}) NOT title : ({phrases}))"
+
+    # category and closed status are tokens in the tags column, see migration 0007,
+    # so those filters are answered by the index
+    if category:
+        match += f' AND tags : "c{int(category)}"'
+    if status == CLOSED:
+        match += " AND tags : closed"
+
+    conditions, params = _price_conditions(min_price, max_price)
+    conditions = ["auctions_auction_fts MATCH %s"] + conditions
+    params = [match] + params
+    if status == ACTIVE:
+        conditions.append("a.is_active = %s")
+        params.append(True)
+    if before is not None:
+        conditions.append("auctions_auction_fts.rowid < %s")
+        params.append(before)
+
+    sql = f"""
+        SELECT a.id FROM auctions_auction_fts
+        JOIN auctions_auction a ON a.id = auctions_auction_fts.rowid
+        WHERE {" AND ".join(conditions)}
+        ORDER BY auctions_auction_fts.rowid DESC
+        LIMIT %s"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _postgresql_ids(words, tier, before, limit, status, category, min_price, max_price):
+    # title words have weight A in the search vector, see migration 0007
+    prefix = "*" if 1 < len(words[-1]) <= MAX_PREFIX else ""
+    any_query = " & ".join(words) + f":{prefix}" if prefix else " & ".join(words)
+    title_query = " & ".join([f"{word}:A" for word in words[:-1]] + [f"{words[-1]}:{prefix}A"])
+
+    if tier == TITLE_TIER:
+        conditions = ["a.search_vector @@ to_tsquery('english', %s)"]
+        params = [title_query]
+    else:
+        conditions = ["a.search_vector @@ to_tsquery('english', %s)",
+                      "NOT a.search_vector @@ to_tsquery('english', %s)"]
+        params = [any_query, title_query]
+
+    price_conditions, price_params = _price_conditions(min_price, max_price)
+    conditions += price_conditions
+    params += price_params
+    if status != ALL:
+        conditions.append("a.is_active = %s")
+        params.append(status == ACTIVE)
+    if category:
+        conditions.append("a.category_id = %s")
+        params.append(int(category))
+    if before is not None:
+        conditions.append("a.id < %s")
+        params.append(before)
+
+    sql = f"""
+        SELECT a.id FROM auctions_auction a
+        WHERE {" AND ".join(conditions)}
+        ORDER BY a.id DESC
+        LIMIT %s"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(words, tier, before, limit, status, category, min_price, max_price):
+    # databases without a full-text index, e.g. MySQL, scan the columns instead
+    auctions = Auction.objects.all()
+    in_title = Auction.objects.all()
+    for word in words:
+        auctions = auctions.filter(title__icontains=word) | auctions.filter(description__icontains=word)
+        in_title = in_title.filter(title__icontains=word)
+    if tier == TITLE_TIER:
+        auctions = in_title
+    else:
+        auctions = auctions.exclude(pk__in=in_title.values("pk"))
+    if status != ALL:
+        auctions = auctions.filter(is_active=status == ACTIVE)
+    if category:
+        auctions = auctions.filter(category_id=category)
+    if min_price is not None:
+        auctions = auctions.filter(current_price__gte=min_price)
+    if max_price is not None:
+        auctions = auctions.filter(current_price__lte=max_price)
+    if before is not None:
+        auctions = auctions.filter(pk__lt=before)
+    return list(auctions.order_by("-id").values_list("id", flat=True)[:limit])
+
+
+def search_listings(query, status=ACTIVE, category=None, min_price=None, max_price=None,
+                    cursor=None, page_size=SEARCH_PAGE_SIZE):
+    """Returns a SearchPage of the auctions whose title or description contain all
+      words of the query. Listings with all words in the title rank first, then the
+      others, each newest first. Both tiers are walked through the full-text index
+      made by migration 0007 in id order, so a page costs the same however common
+      the words are. Following pages are found with the next_cursor of a page."""
+
+    words = [word.lower() for word in WORD_PATTERN.findall(query or "")]
+    if not words:
+        return SearchPage([])
+
+    if connection.vendor == "sqlite":
+        find_ids = _sqlite_ids
+    elif connection.vendor == "postgresql":
+        find_ids = _postgresql_ids
+    else:
+        find_ids = _fallback_ids
+
+    # fetch one row more than needed to know whether there is a next page
+    tier, before = decode_cursor(cursor)
+    found = []
+    while tier <= ANY_TIER and len(found) <= page_size:
+        wanted = page_size + 1 - len(found)
+        ids = find_ids(words, tier, before, wanted, status, category, min_price, max_price)
+        found += [(tier, pk) for pk in ids]
+        if len(ids) == wanted:
+            break
+        tier, before = tier + 1, None
+
+    next_cursor = None
+    if len(found) > page_size:
+        found = found[:page_size]
+        next_cursor = "%d:%d" % found[-1]
+
+    auctions = listing_feed(ListingSummary.objects.filter(pk__in=[pk for tier, pk in found])).in_bulk()
+    return SearchPage([auctions[pk] for tier, pk in found if pk in auctions], next_cursor)
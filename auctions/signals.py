@@ -0,0 +1,174 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.db.models import F
+from django.dispatch import receiver
+
+from .categories import category_list, count_listings, counted_category
+from .feeds import active_feed_page
+from .fragments import invalidate_listing
+from .models import User, Auction, Bid, Category, Comment, ListingSummary
+from .summaries import SOURCE_FIELDS, refresh_summaries
+
+
+@receiver(post_save, sender=Auction)
+@receiver(post_delete, sender=Auction)
+def auction_saved(sender, instance, **kwargs):
+    """Invalidates the cached listing page and feed when an auction changes, e.g.
+      when it is created or closed."""
+
+    invalidate_listing(instance.pk)
+    active_feed_page.invalidate()
+
+
+def _changes_count(update_fields):
+    return update_fields is None or bool({"is_active", "category", "category_id"} & set(update_fields))
+
+
+@receiver(pre_save, sender=Auction)
+def auction_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Remembers which category counted an existing auction before it is saved, if
+      the save can change whether it is active or its category."""
+
+    if raw or instance._state.adding or not _changes_count(update_fields):
+        return
+    row = Auction.objects.filter(pk=instance.pk).values_list("is_active", "category_id").first()
+    instance._counted_category = counted_category(*row) if row else None
+
+
+@receiver(post_save, sender=Auction)
+def auction_counted(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Keeps the active listing counts of categories up to date when an auction is
+      created, closed or moved to another category."""
+
+    if raw or not (created or _changes_count(update_fields)):
+        return
+    before = None if created else instance.__dict__.pop("_counted_category", None)
+    after = counted_category(instance.is_active, instance.category_id)
+    if before != after:
+        count_listings({before: -1, after: 1} if before != None else {after: 1})
+
+
+@receiver(post_delete, sender=Auction)
+def auction_uncounted(sender, instance, **kwargs):
+    """Takes a deleted active auction off the count of its category."""
+
+    count_listings({counted_category(instance.is_active, instance.category_id): -1})
+
+
+@receiver(post_save, sender=Auction)
+def auction_summarized(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Copies a saved auction to its listing summary, unless only columns that no
+      feed shows were saved."""
+
+    if raw or (update_fields is not None and not SOURCE_FIELDS & set(update_fields)):
+        return
+    refresh_summaries([instance.pk])
+
+
+@receiver(post_delete, sender=Auction)
+def auction_unsummarized(sender, instance, **kwargs):
+    """Deletes the listing summary of a deleted auction."""
+
+    ListingSummary.objects.filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=Bid)
+@receiver(post_delete, sender=Bid)
+def bid_summarized(sender, instance, raw=False, **kwargs):
+    """Copies the price and bid count of the auction of a saved or deleted bid to its
+      listing summary, the auction is updated before the bid is saved."""
+
+    if not raw:
+        refresh_summaries([instance.auction_id])
+
+
+@receiver(post_save, sender=Bid)
+@receiver(post_delete, sender=Bid)
+def bid_saved(sender, instance, **kwargs):
+    """Invalidates the cached listing page and feed when a bid changes the price."""
+
+    invalidate_listing(instance.auction_id)
+    active_feed_page.invalidate()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    """Invalidates the cached category list and feed, which shows category names."""
+
+    category_list.invalidate()
+    active_feed_page.invalidate()
+
+
+@receiver(post_save, sender=Category)
+def category_summarized(sender, instance, created, raw=False, **kwargs):
+    """Copies the name of a renamed category to the summaries of its listings."""
+
+    if not (raw or created):
+        # found through the category index of the auctions
+        listings = Auction.objects.filter(category=instance).values("id")
+        ListingSummary.objects.filter(id__in=listings).exclude(category_name=instance.name).update(
+            category_name=instance.name)
+
+
+@receiver(post_delete, sender=Category)
+def category_unsummarized(sender, instance, **kwargs):
+    """Takes a deleted category off the summaries of its listings, like the auctions
+      themselves lose it."""
+
+    ListingSummary.objects.filter(category_id=instance.pk).update(category_id=None, category_name="")
+
+
+@receiver(post_save, sender=User)
+def user_summarized(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Copies the name of a renamed user to the summaries of the user's listings."""
+
+    if raw or created or (update_fields is not None and "username" not in update_fields):
+        return
+    # found through the creator index of the auctions
+    listings = Auction.objects.filter(creator=instance).values("id")
+    ListingSummary.objects.filter(id__in=listings).exclude(creator_name=instance.username).update(
+        creator_name=instance.username)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_saved(sender, instance, **kwargs):
+    """Invalidates the cached listing page when a comment is added or removed."""
+
+    invalidate_listing(instance.auction_id)
+
+
+@receiver(m2m_changed, sender=User.watchlist.through)
+def watchlist_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keeps the watcher counts of auctions up to date and invalidates their cached
+      listing pages when they are added to or removed from a watchlist. Removals
+      are counted before the rows are deleted, in the same transaction, so ids that
+      were not on the watchlist are not counted."""
+
+    if action == "post_add":
+        if reverse:
+            Auction.objects.filter(pk=instance.pk).update(watcher_count=F("watcher_count") + len(pk_set))
+            listings = [instance.pk]
+        else:
+            Auction.objects.filter(pk__in=pk_set).update(watcher_count=F("watcher_count") + 1)
+            listings = pk_set
+
+    elif action in ("pre_remove", "pre_clear"):
+        if reverse:
+            watches = sender.objects.filter(auction_id=instance.pk)
+            if action == "pre_remove":
+                watches = watches.filter(user_id__in=pk_set)
+            Auction.objects.filter(pk=instance.pk).update(watcher_count=F("watcher_count") - watches.count())
+            listings = [instance.pk]
+        else:
+            watches = sender.objects.filter(user_id=instance.pk)
+            if action == "pre_remove":
+                watches = watches.filter(auction_id__in=pk_set)
+            listings = list(watches.values_list("auction_id", flat=True))
+            Auction.objects.filter(pk__in=listings).update(watcher_count=F("watcher_count") - 1)
+
+    else:
+        return
+
+    for listing in listings:
+        invalidate_listing(listing)
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+
+# number of recent events kept per listing, so subscribers that were busy or
+# reconnect with a Last-Event-ID can catch up
+BUFFER_SIZE = 100
+
+# number of waiting subscribers woken at once, see _wake
+WAKE_BATCH = 500
+
+
+class Event:
+    """An event on a listing. Attributes:
+      - sequence(int): Number of the event within its listing, starting at 1.
+      - kind(string): "bid", "comment", "closed" or "resync".
+      - data(dict): JSON serializable details of the event."""
+
+    def __init__(self, sequence, kind, data):
+        self.sequence = sequence
+        self.kind = kind
+        self.data = data
+
+    def as_sse(self):
+        """Returns the event in the Server-Sent Events wire format."""
+
+        return f"id: {self.sequence}\nevent: {self.kind}\ndata: {json.dumps(self.data)}\n\n"
+
+
+class _Channel:
+    """The events and waiting subscribers of one listing."""
+
+    def __init__(self):
+        self.events = deque(maxlen=BUFFER_SIZE)
+        self.sequence = 0
+        self.subscribers = 0
+        # futures of the waiting subscribers grouped by their event loop, so waking
+        # thousands of idle subscribers costs one thread-safe call per loop
+        self.waiters = {}
+
+
+class Subscription:
+    """A subscriber to the events of one listing, see Broker.subscribe."""
+
+    def __init__(self, broker, listing, channel, position):
+        self._broker = broker
+        self._listing = listing
+        self._channel = channel
+        self.position = position
+        self.closed = False
+
+    async def get(self, timeout=None):
+        """Waits for events after the last one returned and returns them as a list.
+          Returns an empty list if no event came within the timeout. If events were
+          missed because the subscriber fell too far behind, a single "resync" event
+          is returned instead."""
+
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._broker._lock:
+                channel = self._channel
+                missed = channel.sequence - self.position
+                if missed > 0:
+                    self.position = channel.sequence
+                    if missed > len(channel.events):
+                        return [Event(channel.sequence, "resync", {})]
+                    # sequences have no gaps, so the missed events are the last ones
+                    return [channel.events[i] for i in range(len(channel.events) - missed, len(channel.events))]
+
+                future = loop.create_future()
+                waiters = channel.waiters.setdefault(loop, set())
+                waiters.add(future)
+
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                return []
+            finally:
+                # the set is only used on this loop, publish just hands it over
+                waiters.discard(future)
+
+    def close(self):
+        """Stops the subscription."""
+
+        if not self.closed:
+            self.closed = True
+            self._broker._release(self._listing)
+
+
+class Broker:
+    """In-process publish/subscribe of listing events. Publishing can be done from
+      any thread, subscribers live on asyncio event loops."""
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, listing, last_sequence=None):
+        """Returns a Subscription to the events of a listing that happen after
+          last_sequence, or after now if last_sequence is None."""
+
+        listing = str(listing)
+        with self._lock:
+            channel = self._channels.get(listing)
+            if channel is None:
+                channel = self._channels[listing] = _Channel()
+            channel.subscribers += 1
+            position = channel.sequence if last_sequence is None else min(last_sequence, channel.sequence)
+        return Subscription(self, listing, channel, position)
+
+    def _release(self, listing):
+        with self._lock:
+            channel = self._channels.get(listing)
+            if channel is not None:
+                channel.subscribers -= 1
+                if channel.subscribers == 0:
+                    del self._channels[listing]
+
+    def subscriber_count(self, listing=None):
+        """Returns the number of subscribers of a listing, or of all listings."""
+
+        with self._lock:
+            if listing is not None:
+                channel = self._channels.get(str(listing))
+                return channel.subscribers if channel else 0
+            return sum(channel.subscribers for channel in self._channels.values())
+
+    def publish(self, listing, kind, data):
+        """Publishes an event to the subscribers of a listing. Returns the event, or
+          None if nobody is subscribed."""
+
+        with self._lock:
+            channel = self._channels.get(str(listing))
+            if channel is None:
+                return None
+            channel.sequence += 1
+            event = Event(channel.sequence, kind, data)
+            channel.events.append(event)
+            waiters, channel.waiters = channel.waiters, {}
+
+        for loop, futures in waiters.items():
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, loop, list(futures))
+        return event
+
+
+def _wake(loop, futures, start=0):
+    # wake subscribers in batches, so the first ones are sent their events while
+    # the rest are still being woken and other work on the loop is not held up
+    for future in futures[start:start + WAKE_BATCH]:
+        if not future.done():
+            future.set_result(None)
+    if len(futures) > start + WAKE_BATCH:
+        loop.call_soon(_wake, loop, futures, start + WAKE_BATCH)
+
+
+# the broker of this process
+broker = Broker()
+
+
+def publish_bid(listing_obj, bid):
+    """Publishes an accepted bid on a listing."""
+
+    broker.publish(listing_obj.pk, "bid", {
+        "amount": str(bid.amount),
+        "bidder": bid.creator.username,
+        "current_price": str(bid.amount),
+    })
+
+
+def publish_comment(comment):
+    """Publishes a new comment on a listing."""
+
+    broker.publish(comment.auction_id, "comment", {
+        "author": comment.creator.username,
+        "content": comment.comment_content,
+    })
+
+
+def publish_closed(listing_obj):
+    """Publishes that a listing was closed."""
+
+    broker.publish(listing_obj.pk, "closed", {
+        "winner": listing_obj.won_by.username if listing_obj.won_by_id else None,
+    })
@@ -0,0 +1,141 @@
+from django.db import transaction
+
+from .models import Auction, ListingSummary
+
+
+# columns of a ListingSummary copied from the auction, its creator and its category
+SUMMARY_FIELDS = ("title", "current_price", "creator_id", "creator_name", "category_id", "category_name",
+                  "thumbnail", "bid_count", "ends_at", "is_active")
+
+# auction columns whose changes a summary must follow, other saves leave it alone
+SOURCE_FIELDS = {"title", "current_price", "creator", "creator_id", "category", "category_id", "thumbnail",
+                 "bid_count", "ends_at", "is_active"}
+
+# number of summaries written or checked at a time by rebuild_summaries and check_summaries
+SUMMARY_BATCH_SIZE = 1000
+
+
+def _sources(auctions):
+    return auctions.select_related("creator", "category").only(
+        "title", "current_price", "creator__username", "category__name", "thumbnail", "bid_count", "ends_at",
+        "is_active")
+
+
+def summary_of(auction):
+    """Returns an unsaved ListingSummary of an auction, loaded with its creator and
+      category."""
+
+    return ListingSummary(
+        id=auction.id,
+        title=auction.title,
+        current_price=auction.current_price,
+        creator_id=auction.creator_id,
+        creator_name=auction.creator.username,
+        category_id=auction.category_id,
+        category_name=auction.category.name if auction.category_id else "",
+        thumbnail=auction.thumbnail,
+        bid_count=auction.bid_count,
+        ends_at=auction.ends_at,
+        is_active=auction.is_active,
+    )
+
+
+def _upsert(summaries):
+    ListingSummary.objects.bulk_create(summaries, batch_size=SUMMARY_BATCH_SIZE, update_conflicts=True,
+        unique_fields=["id"], update_fields=SUMMARY_FIELDS)
+
+
+def refresh_summaries(listings):
+    """Copies the current state of the given auctions (ids) to their summaries, with
+      one query to read them and one to write them, and deletes the summaries of
+      auctions that no longer exist. Call it in the transaction that changed the
+      auctions, e.g. after queryset updates, which send no signals."""
+
+    listings = set(listings)
+    if not listings:
+        return
+    summaries = [summary_of(auction) for auction in _sources(Auction.objects.filter(pk__in=listings))]
+    if summaries:
+        _upsert(summaries)
+    if len(summaries) < len(listings):
+        ListingSummary.objects.filter(pk__in=listings - {summary.id for summary in summaries}).delete()
+
+
+def rebuild_summaries(batch_size=SUMMARY_BATCH_SIZE, progress=None):
+    """Builds all summaries again from the auctions, in one transaction, reading the
+      auctions in batches. Calls progress(written) after every batch if given.
+      Returns the number of summaries."""
+
+    written = 0
+    with transaction.atomic():
+        ListingSummary.objects.all().delete()
+        batch = []
+        for auction in _sources(Auction.objects.order_by("id")).iterator(chunk_size=batch_size):
+            batch.append(summary_of(auction))
+            if len(batch) == batch_size:
+                ListingSummary.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+                if progress:
+                    progress(written)
+        if batch:
+            ListingSummary.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+class SummaryReport:
+    """The differences between the summaries and the auctions. Attributes:
+      - checked(int): Number of auctions that were compared.
+      - missing(list): Ids of auctions without summary.
+      - stale(dict): Per id of an auction, the fields whose summary differs, as
+        (summary value, auction value) pairs.
+      - orphaned(list): Ids of summaries without auction."""
+
+    def __init__(self):
+        self.checked = 0
+        self.missing = []
+        self.stale = {}
+        self.orphaned = []
+
+    @property
+    def consistent(self):
+        return not (self.missing or self.stale or self.orphaned)
+
+    def as_dict(self):
+        return {"checked": self.checked, "missing": self.missing, "orphaned": self.orphaned,
+                "stale": {pk: {field: [str(value) for value in values] for field, values in fields.items()}
+                          for pk, fields in self.stale.items()}}
+
+
+def check_summaries(batch_size=SUMMARY_BATCH_SIZE):
+    """Compares every summary with its auction, batch_size auctions at a time, and
+      returns a SummaryReport."""
+
+    report = SummaryReport()
+    batch = []
+
+    def compare(batch):
+        summaries = ListingSummary.objects.in_bulk([expected.id for expected in batch])
+        for expected in batch:
+            summary = summaries.get(expected.id)
+            if summary == None:
+                report.missing.append(expected.id)
+                continue
+            fields = {field: (getattr(summary, field), getattr(expected, field)) for field in SUMMARY_FIELDS
+                      if getattr(summary, field) != getattr(expected, field)}
+            if fields:
+                report.stale[expected.id] = fields
+        report.checked += len(batch)
+
+    for auction in _sources(Auction.objects.order_by("id")).iterator(chunk_size=batch_size):
+        batch.append(summary_of(auction))
+        if len(batch) == batch_size:
+            compare(batch)
+            batch = []
+    if batch:
+        compare(batch)
+
+    report.orphaned = list(ListingSummary.objects.exclude(pk__in=Auction.objects.values("pk"))
+        .order_by("id").values_list("id", flat=True))
+    return report
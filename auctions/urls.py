@@ -1,20 +1,37 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import api, async_views, views
 
 app_name = "auctions"
 
+# the views of the listing read path, async ones with the ASYNC_VIEWS setting
+read_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
-    path("", views.index, name="index"),
+    path("", read_views.index, name="index"),
     path("login", views.login_view, name="login"),
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
     path("create_listing", views.create_listing, name="create_listing"),
-    path("categories", views.categories, name="categories"),
-    path("watchlist", views.watchlist, name="watchlist"),
+    path("categories", read_views.categories, name="categories"),
+    path("search", views.search, name="search"),
+    path("watchlist", read_views.watchlist, name="watchlist"),
     path("my_listings", views.my_listings, name="my_listings"),
-    path("category/<str:category>", views.category, name="category"),
-    path("view_listing/<str:listing>", views.view_listing, name="view_listing"),
+    path("import_listings", views.import_listings, name="import_listings"),
+    path("export_listings", views.export_listings, name="export_listings"),
+    path("category/<str:category>", read_views.category, name="category"),
+    path("view_listing/<str:listing>", read_views.view_listing, name="view_listing"),
     path("bid/<str:listing>", views.bid, name="bid"),
-    path("comment/<str:listing>", views.comment, name="comment")
+    path("proxy_bid/<str:listing>", views.proxy_bid, name="proxy_bid"),
+    path("comment/<str:listing>", views.comment, name="comment"),
+    path("bid_history/<str:listing>", views.bid_history, name="bid_history"),
+    path("comment_history/<str:listing>", views.comment_history, name="comment_history"),
+    path("listing_events/<str:listing>", views.listing_events, name="listing_events"),
+    path("images/<str:name>", views.listing_image, name="listing_image"),
+    path("api/listings", api.listings, name="api_listings"),
+    path("api/listings/<int:listing>", api.listing, name="api_listing"),
+    path("api/listings/<int:listing>/bids", api.listing_bids, name="api_listing_bids"),
+    path("api/listings/<int:listing>/comments", api.listing_comments, name="api_listing_comments"),
+    path("api/watchlist", api.watchlist, name="api_watchlist")
 ]
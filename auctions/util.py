@@ -1,33 +1,63 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.middleware import get_user
 from django.shortcuts import render
+from django.utils.functional import SimpleLazyObject
 
-from .forms import Bid_form, Comment_form
+from .forms import Bid_form, Comment_form, Proxy_bid_form
+from .fragments import alisting_fragment, listing_fragment
 from .models import Auction
+from .watchlist import ais_watched, is_watched
 
 
-def render_listing(request, listing, bid_form=None, comment_form=Comment_form()):
+def render_listing(request, listing, bid_form=None, comment_form=Comment_form(), proxy_form=None):
     """Retrieves all variables needed to render the listing page, and renders it.
-      Needs the request and listing id as arguments and accepts bid_form and 
-      comment_form as optional named arguments."""
+      Needs the request and listing id as arguments and accepts bid_form, 
+      comment_form and proxy_form as optional named arguments. The parts of the page that are
+      the same for every user come from the listing fragment cache."""
+
+    # the creator and category are shown in the listing fragment
+    listing_obj = Auction.objects.select_related("creator", "category").get(pk=listing)
+
+    return _render_listing(request, listing_obj, is_watched(request.user, listing_obj),
+        listing_fragment(listing_obj), bid_form, comment_form, proxy_form)
+
+
+async def aload_user(request):
+    """Loads the user of the request in a thread and returns it. request.user is a
+      lazy object that would query the session and user in the event loop, which
+      Django refuses, so async views call this before they use or render it."""
+
+    if isinstance(request.user, SimpleLazyObject):
+        request.user = await sync_to_async(get_user)(request)
+    return request.user
 
-    listing_obj = Auction.objects.get(pk=listing)
 
+async def arender_listing(request, listing, bid_form=None, comment_form=Comment_form(), proxy_form=None):
+    """Renders the listing page like render_listing, for async views. The user and
+      listing are loaded concurrently, then the fragments and watchlist state."""
+
+    user, listing_obj = await asyncio.gather(aload_user(request),
+        Auction.objects.select_related("creator", "category").aget(pk=listing))
+    fragment, on_watchlist = await asyncio.gather(alisting_fragment(listing_obj), ais_watched(user, listing_obj))
+
+    return _render_listing(request, listing_obj, on_watchlist, fragment, bid_form, comment_form, proxy_form)
+
+
+def _render_listing(request, listing_obj, on_watchlist, fragment, bid_form, comment_form, proxy_form):
     if bid_form == None:
-        bid_form = Bid_form(listing=listing)
+        bid_form = Bid_form(listing=listing_obj)
+    if proxy_form == None:
+        proxy_form = Proxy_bid_form(listing=listing_obj)
 
-    on_watchlist, own_listing, listing_won = False, False, False
+    own_listing, listing_won = False, False
 
-    if listing_obj in request.user.watchlist.all():
-        on_watchlist = True
- 
-    if listing_obj.creator == request.user:
+    if listing_obj.creator_id == request.user.id:
         own_listing = True
 
-    if listing_obj.auction_bids.all():
-        if listing_obj.auction_bids.last().creator == request.user:
-            listing_won =True
-
-    current_bids = listing_obj.auction_bids.all()
-    comments = listing_obj.comments.all()
+    if listing_obj.highest_bidder_id != None and listing_obj.highest_bidder_id == request.user.id:
+        listing_won = True
 
     return render(request, "auctions/view_listing.html", {
         "auction": listing_obj,
@@ -35,7 +65,7 @@ def render_listing(request, listing, bid_form=None, comment_form=Comment_form())
         "own_listing": own_listing,
         "listing_won": listing_won,
         "bid_form": bid_form,
-        "current_bids": current_bids,
+        "proxy_form": proxy_form,
         "comment_form": comment_form,
-        "comments": comments
+        "fragment": fragment
     })
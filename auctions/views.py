@@ -8,29 +8,64 @@
 ###################################################################
 
 
+import asyncio
+from datetime import timedelta
+
 from django.contrib.auth import authenticate, login, logout
+from django.core.handlers.asgi import ASGIRequest
 from django.db import IntegrityError
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.shortcuts import render
-
-from .forms import New_listing_form, Bid_form, Comment_form
-from .models import User, Auction, Category, Bid, Comment
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
+
+from . import catalogue, history
+from .bidding import place_bid, place_proxy_bid, OUTBID, PROXY_OUTBID, CLOSED
+from .categories import category_list, get_category
+from .closing import close_listing
+from .dashboard import dashboard
+from .feeds import active_listings, current_feed_page, listing_feed, paginate_feed
+from .forms import New_listing_form, Bid_form, Comment_form, Proxy_bid_form, Search_form
+from .images import IMAGE_CACHE_CONTROL, IMAGE_NAME, image_path, process_listing_image_later
+from .models import User, Auction, Comment
+from .search import search_listings
+from .streams import broker, publish_bid, publish_closed, publish_comment, Event
 from .util import render_listing
+from .watchlist import add_to_watchlist, remove_from_watchlist, watched_ids, watchlist_feed
+from .writes import run_write
+
+
+# seconds between keep-alive comments on an idle event stream
+HEARTBEAT_INTERVAL = 15
+
+# seconds an event stream is held open before the client is made to reconnect. The
+# ASGI handler does not notice clients that went away while a response streams, so
+# without an end their subscriptions would be kept forever
+STREAM_LIFETIME = 5 * 60
 
 
-def index(request, page_title="Active Listings", auctions=None, won_listings=None):
+def index(request, page_title="Active Listings", auctions=None, all_watched=False):
     """Renders a page with a list of auction listings. Has optional parameters for a 
-      page title (string), a list of auction listings to be displayed, and a seperate 
-      list of won auction listings for the 'my listings' page."""
+      page title (string) and a list of auction listings to be displayed. The listings are paginated
+      by the 'sort' and 'cursor' GET parameters. Listings on the user's watchlist are
+      marked, all_watched(bool) says that all of them are without asking the database."""
 
     if auctions == None:
-        auctions = Auction.objects.filter(is_active=True)
+        page = current_feed_page(request.GET.get("sort"), request.GET.get("cursor"))
+    else:
+        page = paginate_feed(listing_feed(auctions), request.GET.get("sort"), request.GET.get("cursor"))
+
+    # look up the watched listings of the whole page at once
+    if all_watched:
+        watched = {auction.id for auction in page}
+    else:
+        watched = watched_ids(request.user, page.items)
 
     return render(request, "auctions/index.html", {
         "page_title": page_title,
-        "auctions": auctions,
-        "won_listings": won_listings
+        "auctions": page,
+        "watched": watched
     })
 
 
@@ -117,12 +152,18 @@ def create_listing(request):
         description = form.cleaned_data["description"],
         starting_bid = form.cleaned_data["starting_bid"],
         current_price = form.cleaned_data["starting_bid"],
-        category = Category.objects.get(pk=form.cleaned_data["category"]),
+        category_id = form.cleaned_data["category"],
         image = form.cleaned_data["image"],
         creator = request.user
     )
+    if form.cleaned_data["duration"] != None:
+        auction.ends_at = timezone.now() + timedelta(days=form.cleaned_data["duration"])
     auction.save()
 
+    # the thumbnails are made in the background, the feed shows a placeholder until then
+    if auction.image:
+        process_listing_image_later(auction)
+
     return redirect("auctions:index")
 
 
@@ -139,16 +180,17 @@ def view_listing(request, listing):
     listing_obj = Auction.objects.get(pk=listing)
 
     if "add" in request.POST:
-        request.user.watchlist.add(listing_obj)
+        add_to_watchlist(request.user, [listing_obj])
         return redirect("auctions:view_listing", listing)
     elif "remove" in request.POST:
-        request.user.watchlist.remove(listing_obj)
+        remove_from_watchlist(request.user, [listing_obj])
         return redirect("auctions:view_listing", listing)
     elif "close" in request.POST:
-        # set listing to no longer active and appoint winner to auction
-        listing_obj.is_active = False
-        listing_obj.won_by = listing_obj.auction_bids.last().creator
-        listing_obj.save()
+        # set listing to no longer active and appoint winner to auction, only the
+        # request that closed it publishes that, another closer may have been first
+        if close_listing(listing_obj.pk):
+            listing_obj.refresh_from_db()
+            publish_closed(listing_obj)
         return redirect("auctions:view_listing", listing)
 
 
@@ -158,23 +200,56 @@ def bid(request, listing):
       is being bid on as parameter."""
 
     listing_obj = Auction.objects.get(pk=listing)
-    form = Bid_form(request.POST, listing=listing)
+    form = Bid_form(request.POST, listing=listing_obj)
 
     # if bid not valid, return the listing page with error message
     if not form.is_valid():
         return render_listing(request, listing, bid_form=form)
 
-    # if bid is valid, save bid and redirect to listing page
-    new_bid = Bid(
-        amount = form.cleaned_data["amount"],
-        creator = request.user,
-        auction = listing_obj
-        )
-    new_bid.save()
+    # if bid is valid, try to place it, another bid may have been placed in the meantime
+    result = run_write(place_bid, listing_obj, request.user, form.cleaned_data["amount"])
+
+    if result.outcome == OUTBID:
+        form.add_error("amount", "Error: Bid must be higher than the previous bids.")
+        return render_listing(request, listing, bid_form=form)
+    elif result.outcome == CLOSED:
+        form.add_error("amount", "Error: This listing is closed.")
+        return render_listing(request, listing, bid_form=form)
+
+    # let everyone watching the listing know about the new price
+    for placed in result.bids:
+        publish_bid(listing_obj, placed)
+
+    if result.outcome == PROXY_OUTBID:
+        form.add_error("amount", "Error: Another bidder bids more automatically.")
+        return render_listing(request, listing, bid_form=form)
+
+    return redirect("auctions:view_listing", listing)
+
+
+def proxy_bid(request, listing):
+    """Handles the logic for when the user posts the maximum of a proxy bid, which
+      then bids for the user up to that maximum. Needs a listing id(string) for
+      the listing that is being bid on as parameter."""
+
+    listing_obj = Auction.objects.get(pk=listing)
+    form = Proxy_bid_form(request.POST, listing=listing_obj)
+
+    # if maximum not valid, return the listing page with error message
+    if not form.is_valid():
+        return render_listing(request, listing, proxy_form=form)
+
+    result = run_write(place_proxy_bid, listing_obj, request.user, form.cleaned_data["amount"])
+
+    for placed in result.bids:
+        publish_bid(listing_obj, placed)
 
-    # update current price
-    listing_obj.current_price = form.cleaned_data["amount"]
-    listing_obj.save()
+    if result.outcome == OUTBID:
+        form.add_error("amount", "Error: Another bidder bids more automatically.")
+        return render_listing(request, listing, proxy_form=form)
+    elif result.outcome == CLOSED:
+        form.add_error("amount", "Error: This listing is closed.")
+        return render_listing(request, listing, proxy_form=form)
 
     return redirect("auctions:view_listing", listing)
 
@@ -197,17 +272,203 @@ def comment(request, listing):
         creator = request.user,
         auction = listing_obj
         )
-    new_comment.save()
+    run_write(new_comment.save)
+    publish_comment(new_comment)
 
     return redirect("auctions:view_listing", listing)
 
 
+def search(request):
+    """Renders a page with the listings matching the search form in the GET
+      parameters, best match first."""
+
+    form = Search_form(request.GET or None)
+
+    # if there is no valid search yet, show only the form
+    if not form.is_valid():
+        return render(request, "auctions/search.html", {
+            "form": form
+        })
+
+    results = search_listings(
+        form.cleaned_data["q"],
+        status=form.cleaned_data["status"] or "active",
+        category=form.cleaned_data["category"] or None,
+        min_price=form.cleaned_data["min_price"],
+        max_price=form.cleaned_data["max_price"],
+        cursor=form.cleaned_data["cursor"])
+
+    # the link to the next page keeps the search but replaces the cursor
+    parameters = request.GET.copy()
+    parameters.pop("cursor", None)
+
+    return render(request, "auctions/search.html", {
+        "form": form,
+        "results": results,
+        "parameters": parameters.urlencode()
+    })
+
+
+async def listing_events(request, listing):
+    """Streams the bids, comments and closing of a listing as Server-Sent Events,
+      so watchers get updates without reloading the listing page. A reconnecting
+      client continues after its Last-Event-ID. Needs the listing id(string) as
+      parameter and an ASGI server, the connection is held open for up to
+      STREAM_LIFETIME seconds."""
+
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse("Listing events need an ASGI server.", status=501)
+
+    row = await Auction.objects.filter(pk=listing).values_list("ends_at").afirst()
+    if row == None:
+        raise Http404("Listing does not exist.")
+    ends_at = row[0]
+
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    subscription = broker.subscribe(listing, int(last_event_id) if last_event_id.isdigit() else None)
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_LIFETIME
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                # the client reconnects after the retry delay with its Last-Event-ID
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                # the closer may run in another process, so watchers see the end time pass themselves
+                if ends_at != None:
+                    until_end = (ends_at - timezone.now()).total_seconds()
+                    if until_end <= 0:
+                        yield await _ended_event(listing, subscription.position)
+                        return
+                    remaining = min(remaining, until_end)
+                events = await subscription.get(timeout=min(HEARTBEAT_INTERVAL, remaining))
+                if not events:
+                    yield ": keep-alive\n\n"
+                for event in events:
+                    yield event.as_sse()
+                    if event.kind == "closed":
+                        return
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def _ended_event(listing, sequence):
+    """Returns the "closed" event of a listing whose end time has passed, in the
+      Server-Sent Events wire format. Bids after the end time are refused, so its
+      highest bidder has won, whether or not it was closed yet."""
+
+    winner = await (Auction.objects.filter(pk=listing)
+        .values_list("highest_bidder__username", flat=True).afirst())
+    return Event(sequence, "closed", {"winner": winner}).as_sse()
+
+
+def bid_history(request, listing):
+    """Returns the bids on a listing older than the 'cursor' GET parameter as JSON,
+      for the "load more" button of the listing page. Needs the listing id(string)
+      as parameter."""
+
+    page = history.bid_history(listing, request.GET.get("cursor"))
+    return JsonResponse({
+        "items": [{"amount": str(bid.amount), "bidder": bid.creator.username} for bid in page],
+        "next_cursor": page.next_cursor
+    })
+
+
+def comment_history(request, listing):
+    """Returns the comments on a listing older than the 'cursor' GET parameter as
+      JSON, for the "load more" button of the listing page. Needs the listing
+      id(string) as parameter."""
+
+    page = history.comment_history(listing, request.GET.get("cursor"))
+    return JsonResponse({
+        "items": [{"author": comment.creator.username, "content": comment.comment_content} for comment in page],
+        "next_cursor": page.next_cursor
+    })
+
+
+def _catalogue_format(request, upload=None):
+    """Returns the catalogue format of an import or export request, from the 'format'
+      parameter, the name of the uploaded file or the content type of the body."""
+
+    format = request.GET.get("format") or request.POST.get("format")
+    if format:
+        return format
+    if upload != None and "." in upload.name:
+        return upload.name.rsplit(".", 1)[1].lower()
+    if request.content_type == "text/csv":
+        return catalogue.CSV
+    if request.content_type in ("application/jsonl", "application/x-ndjson", "application/json-lines"):
+        return catalogue.JSONL
+    return None
+
+
+def import_listings(request):
+    """Creates listings of the user from a posted CSV or JSON Lines catalogue, as an
+      uploaded 'file' or as the request body, and returns the number of created
+      listings and the errors of the skipped rows as JSON. The catalogue is read
+      and inserted in batches while it is uploaded, see catalogue.import_listings."""
+
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Log in to import listings."}, status=403)
+    if request.method != "POST":
+        return JsonResponse({"error": "Post a catalogue to import."}, status=405)
+
+    upload = request.FILES.get("file")
+    format = _catalogue_format(request, upload)
+    if format not in catalogue.FORMATS:
+        return JsonResponse({"error": f"Give the format, one of {', '.join(catalogue.FORMATS)}."}, status=400)
+
+    stream = catalogue.text_stream(upload.file if upload != None else request)
+    report = catalogue.import_listings(catalogue.read_rows(stream, format), request.user)
+    return JsonResponse(report.as_dict(), status=201 if report.created else 200)
+
+
+def export_listings(request):
+    """Streams the listings the user has created, with their bids, as a CSV or JSON
+      Lines ('format' GET parameter, the default) download."""
+
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Log in to export listings."}, status=403)
+
+    format = _catalogue_format(request) or catalogue.JSONL
+    if format not in catalogue.FORMATS:
+        return JsonResponse({"error": f"Give the format, one of {', '.join(catalogue.FORMATS)}."}, status=400)
+
+    content_type = "text/csv" if format == catalogue.CSV else "application/jsonl"
+    response = StreamingHttpResponse(catalogue.export_listings(request.user.auctions.all(), format),
+        content_type=f"{content_type}; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="listings.{format}"'
+    return response
+
+
+def listing_image(request, name):
+    """Serves a stored thumbnail or detail image of a listing. Needs the image
+      name(string), its content hash, as parameter."""
+
+    if not IMAGE_NAME.fullmatch(name):
+        raise Http404("Image not found.")
+    try:
+        response = FileResponse(open(image_path(name), "rb"), content_type="image/jpeg")
+    except FileNotFoundError:
+        raise Http404("Image not found.")
+    response["Cache-Control"] = IMAGE_CACHE_CONTROL
+    return response
+
+
 def categories(request):
     """Renders page with a list of all the categories containing links
-      to those categories."""
+      to those categories and their number of active listings."""
 
     return render(request, "auctions/categories.html", {
-        "categories": Category.objects.all()
+        "categories": category_list()
     })
 
 
@@ -215,25 +476,42 @@ def category(request, category):
     """Renders a page with all the active listings in a certain category. 
       Needs the category id(string) as parameter."""
 
-    category_obj = Category.objects.get(pk=category)
+    category_obj = get_category(category)
+    if category_obj == None:
+        raise Http404("Category not found.")
 
-    return index(request, category_obj.name,
-                category_obj.category_auctions.filter(is_active=True))
+    return index(request, category_obj.name, active_listings().filter(category_id=category_obj.id))
 
 
 def watchlist(request):
-    """Renders a page with all the listings the user has put on his/her watchlist."""
+    """Renders a page with all the listings the user has put on his/her watchlist.
+      A POST adds ("add") or removes ("remove") all posted 'listing' ids at once
+      and redirects to the 'next' page, or back to the watchlist."""
 
-    return index(request, "Watchlist", request.user.watchlist.all())
+    if request.method != "POST":
+        return index(request, "Watchlist", watchlist_feed(request.user), all_watched=True)
 
+    listings = [listing for listing in request.POST.getlist("listing") if listing.isdigit()]
 
-def my_listings(request):
-    """Renders a page with all the listings the user has created and all the listings 
-      the user has won."""
+    if "add" in request.POST:
+        add_to_watchlist(request.user, listings)
+    elif "remove" in request.POST:
+        remove_from_watchlist(request.user, listings)
 
-    my_auctions, won_auctions = request.user.auctions.all(), None
+    next_page = request.POST.get("next", "")
+    if not url_has_allowed_host_and_scheme(next_page, allowed_hosts={request.get_host()}):
+        return redirect("auctions:watchlist")
+    return redirect(next_page)
 
-    if Auction.objects.filter(won_by=request.user):
-        won_auctions = Auction.objects.filter(won_by=request.user)
 
-    return index(request, "Listings you have created", my_auctions, won_auctions)
+def my_listings(request):
+    """Renders the user's dashboard with the number of listings the user has created,
+      of those that are active, won and where the user has the highest bid, and a
+      page of each, paginated by the '<section>_cursor' GET parameters."""
+
+    if not request.user.is_authenticated:
+        return redirect("auctions:login")
+
+    return render(request, "auctions/dashboard.html", {
+        "sections": dashboard(request.user, request.GET)
+    })
@@ -0,0 +1,71 @@
+from .models import User
+
+
+# the table behind User.watchlist, one row per watched auction with a unique
+# index on (user, auction)
+Watch = User.watchlist.through
+
+
+def _ids(listings):
+    return [getattr(listing, "pk", listing) for listing in listings]
+
+
+def is_watched(user, listing):
+    """Returns whether the listing (an Auction or its id) is on the user's watchlist,
+      answered from the unique index without loading the watchlist."""
+
+    if not user.is_authenticated:
+        return False
+    return Watch.objects.filter(user_id=user.pk, auction_id=getattr(listing, "pk", listing)).exists()
+
+
+async def ais_watched(user, listing):
+    """Returns whether the listing is on the user's watchlist like is_watched, with
+      the async ORM interface."""
+
+    if not user.is_authenticated:
+        return False
+    return await Watch.objects.filter(user_id=user.pk, auction_id=getattr(listing, "pk", listing)).aexists()
+
+
+def watched_ids(user, listings):
+    """Returns the set of ids of the given listings (Auctions or ids) that are on the
+      user's watchlist, with a single query, e.g. to mark a whole feed page."""
+
+    listings = _ids(listings)
+    if not user.is_authenticated or not listings:
+        return set()
+    return set(Watch.objects.filter(user_id=user.pk, auction_id__in=listings)
+        .values_list("auction_id", flat=True))
+
+
+async def awatched_ids(user, listings):
+    """Returns the set of ids of the given listings on the user's watchlist like
+      watched_ids, with the async ORM interface."""
+
+    listings = _ids(listings)
+    if not user.is_authenticated or not listings:
+        return set()
+    return {pk async for pk in Watch.objects.filter(user_id=user.pk, auction_id__in=listings)
+        .values_list("auction_id", flat=True)}
+
+
+def add_to_watchlist(user, listings):
+    """Adds the given listings (Auctions or ids) to the user's watchlist with one
+      insert. Listings that are already watched are skipped."""
+
+    user.watchlist.add(*_ids(listings))
+
+
+def remove_from_watchlist(user, listings):
+    """Removes the given listings (Auctions or ids) from the user's watchlist with
+      one delete."""
+
+    user.watchlist.remove(*_ids(listings))
+
+
+def watchlist_feed(user):
+    """Returns a queryset of the auctions on the user's watchlist, to be paginated
+      with feeds.paginate_feed."""
+
+    return user.watchlist.all()
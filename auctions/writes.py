@@ -0,0 +1,102 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+# most writes committed by one transaction
+WRITE_BATCH_SIZE = 64
+
+
+class WriteQueue:
+    """Runs writes submitted by many threads on a single writer thread, which
+      commits all writes that queued up while it was busy in one transaction. On
+      SQLite only one transaction can write at a time and every commit waits for
+      the disk, so fewer, larger transactions write faster than concurrent ones.
+      Every write runs in its own savepoint, a write that fails is rolled back
+      alone and its exception is raised in the thread that submitted it."""
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.transactions = 0
+        self.writes = 0
+
+    def submit(self, function, *args, **kwargs):
+        """Queues a call of function and returns a Future of its result."""
+
+        future = Future()
+        self._queue.put((future, function, args, kwargs))
+        if self._thread is None:
+            self._start()
+        return future
+
+    def run(self, function, *args, **kwargs):
+        """Calls function on the writer thread and returns its result once the
+          transaction it ran in was committed."""
+
+        # a write that queues another write would wait for itself
+        if threading.current_thread() is self._thread:
+            return function(*args, **kwargs)
+        return self.submit(function, *args, **kwargs).result()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write, name="write-queue", daemon=True)
+                self._thread.start()
+
+    def _write(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with transaction.atomic():
+                for future, function, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            results.append((future, function(*args, **kwargs), None))
+                    except Exception as error:
+                        results.append((future, None, error))
+        except Exception as error:
+            # the commit failed, so did every write of the batch
+            connection.close_if_unusable_or_obsolete()
+            for future, function, args, kwargs in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        self.transactions += 1
+        self.writes += len(results)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+write_queue = WriteQueue()
+
+
+def run_write(function, *args, **kwargs):
+    """Calls function through the write queue if settings.WRITE_QUEUE is on,
+      otherwise directly, and returns its result. Inside a transaction the write
+      stays part of it and is not queued."""
+
+    if getattr(settings, "WRITE_QUEUE", False) and not connection.in_atomic_block:
+        return write_queue.run(function, *args, **kwargs)
+    return function(*args, **kwargs)
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commerce.settings')
+# every ASGI request runs in another thread, which would open its own connection,
+# so PostgreSQL connections are pooled unless DATABASE_POOL=0
+os.environ.setdefault('DATABASE_POOL', '1')
 
 application = get_asgi_application()
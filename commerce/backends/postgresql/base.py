@@ -0,0 +1,69 @@
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """The PostgreSQL backend, with connections taken from a psycopg_pool
+      ConnectionPool shared by all threads of the process. Closing a connection
+      returns it to the pool, so ASGI requests, which each run in another thread,
+      reuse connections instead of opening one per request. The pool is configured
+      with OPTIONS["pool"], e.g. {"min_size": 2, "max_size": 20}, see
+      commerce.databases.parse_database_url."""
+
+    # pools per database alias and name, the test database gets its own
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    @property
+    def pool(self):
+        key = (self.alias, self.settings_dict["NAME"])
+        pool = self._pools.get(key)
+        if pool is not None:
+            return pool
+
+        if ConnectionPool == None or not is_psycopg3:
+            raise ImproperlyConfigured("Pooled PostgreSQL connections need psycopg 3 and psycopg_pool, "
+                "install psycopg[pool] or set DATABASE_POOL=0.")
+
+        with self._pools_lock:
+            if key not in self._pools:
+                self._pools[key] = ConnectionPool(kwargs=self.get_connection_params(),
+                    name=self.alias, open=True, **self.settings_dict["OPTIONS"].get("pool", {}))
+            return self._pools[key]
+
+    def get_new_connection(self, conn_params):
+        # connections to the "postgres" database, e.g. to create the test database,
+        # are short lived and not pooled
+        if self.settings_dict["NAME"] == None:
+            return super().get_new_connection(conn_params)
+
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        try:
+            self.isolation_level = IsolationLevel(isolation_level or IsolationLevel.READ_COMMITTED)
+        except ValueError:
+            raise ImproperlyConfigured(f"Invalid transaction isolation level {isolation_level} specified.")
+
+        connection = self.pool.getconn()
+        if isolation_level != None:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is not None and self.settings_dict["NAME"] != None:
+            with self.wrap_database_errors:
+                # the pool rolls back an unfinished transaction before reusing it
+                return self.pool.putconn(self.connection)
+        return super()._close()
@@ -0,0 +1,24 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """The SQLite backend, with the pragmas of OPTIONS["pragmas"] run on every new
+      connection and transactions started with BEGIN IMMEDIATE. A deferred
+      transaction that reads first and writes later cannot wait for the write lock,
+      SQLite fails it with "database is locked" at once, while an immediate one
+      takes the lock at the start and waits up to busy_timeout for it. See
+      commerce.databases.SQLITE_PRAGMAS."""
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pragmas", None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict["OPTIONS"].get("pragmas", {}).items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
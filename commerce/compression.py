@@ -0,0 +1,120 @@
+import gzip
+import mimetypes
+import os
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.middleware.gzip import GZipMiddleware as DjangoGZipMiddleware
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# content types worth compressing, images and fonts are compressed already
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+# responses sent as they are produced, a compressor would hold them back until its block is full
+STREAMED_TYPES = ("text/event-stream",)
+
+# compressed files are only kept when they are at most this fraction of the original
+MAX_COMPRESSED_RATIO = 0.9
+
+# suffixes of the precompressed variants of a static file, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# names written by ManifestStaticFilesStorage end in a 12 character hash of the content
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+
+# hashed static files never change, other names may be replaced by the next collectstatic
+HASHED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+UNHASHED_CACHE_CONTROL = "public, max-age=3600"
+
+
+def is_compressible(content_type):
+    """Returns whether responses of the content type, which may have parameters,
+      are compressed."""
+
+    content_type = content_type.split(";")[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) and content_type not in STREAMED_TYPES
+
+
+def compressed_variants(data):
+    """Returns the gzip and, if the brotli package is installed, brotli compressed
+      data as a dict of file suffix to bytes, leaving out the ones not small enough
+      to be worth it."""
+
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli != None:
+        variants[".br"] = brotli.compress(data, quality=11)
+
+    return {suffix: compressed for suffix, compressed in variants.items()
+            if len(compressed) <= len(data) * MAX_COMPRESSED_RATIO}
+
+
+class GZipMiddleware(DjangoGZipMiddleware):
+    """Django's GZipMiddleware for text responses only. Event streams and images
+      are passed on as they are."""
+
+    def process_response(self, request, response):
+        if not is_compressible(response.get("Content-Type", "")):
+            return response
+        return super().process_response(request, response)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Static files storage that, besides the hashed copies of the files, writes
+      gzip and brotli compressed variants of the hashed text files for serve_static.
+      Brotli variants need the brotli package."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        for hashed_name in set(self.hashed_files.values()):
+            content_type, _ = mimetypes.guess_type(hashed_name)
+            if content_type == None or not is_compressible(content_type):
+                continue
+
+            with self.open(hashed_name) as file:
+                data = file.read()
+            for suffix, compressed in compressed_variants(data).items():
+                # _save would pick another name for an existing file
+                if self.exists(hashed_name + suffix):
+                    self.delete(hashed_name + suffix)
+                self._save(hashed_name + suffix, ContentFile(compressed))
+
+
+def serve_static(request, path, document_root):
+    """Serves a collected static file, the precompressed variant the client accepts
+      if there is one. Hashed names are cached for a year."""
+
+    try:
+        full_path = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404("Static file not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("Static file not found.")
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    accepted = request.headers.get("Accept-Encoding", "")
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if re.search(rf"\b{name}\b", accepted) and os.path.isfile(full_path + suffix):
+            encoding, full_path = name, full_path + suffix
+            break
+
+    response = FileResponse(open(full_path, "rb"), content_type=content_type or "application/octet-stream",
+                            filename=os.path.basename(path))
+    if encoding != None:
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    response["Cache-Control"] = HASHED_CACHE_CONTROL if HASHED_NAME.search(path) else UNHASHED_CACHE_CONTROL
+    return response
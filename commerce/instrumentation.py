@@ -0,0 +1,389 @@
+import bisect
+import hmac
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib import admin
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.shortcuts import render
+from django.template.backends.django import DjangoTemplates, Template
+
+from auctions.caching import cache_accessed
+
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# number of latencies kept per view for percentiles on the admin page
+RESERVOIR_SIZE = 1024
+
+# a request running the same SQL this often is flagged as an N+1 pattern
+N_PLUS_ONE_THRESHOLD = 5
+
+# number of distinct flagged statements kept per view
+MAX_FLAGGED_QUERIES = 20
+
+# name used for requests that did not resolve to a view, e.g. 404s
+UNRESOLVED = "<unresolved>"
+
+# the metrics of the request being handled, also seen by sync_to_async threads
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """What one request did. Attributes:
+      - queries(int), query_time(float): Number and total seconds of SQL queries.
+      - template_time(float): Seconds spent rendering templates.
+      - cache_hits(int), cache_misses(int): Lookups in auctions.caching.
+      - statements(Counter): How often each SQL statement was run."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.statements = Counter()
+        self.rendering = False
+
+
+class ViewTotals:
+    """Totals of the requests to one view, see record."""
+
+    __slots__ = ("requests", "duration", "buckets", "queries", "query_time", "template_time",
+                 "cache_hits", "cache_misses", "n_plus_one")
+
+    def __init__(self):
+        self.requests = 0
+        self.duration = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.n_plus_one = 0
+
+    def add(self, other):
+        for name in self.__slots__:
+            if name == "buckets":
+                self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+            else:
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+class Reservoir:
+    """A uniform random sample of at most size values of a stream (algorithm R).
+      Positions come from itertools.count and list appends and item assignments are
+      atomic, so threads can add values without a lock."""
+
+    def __init__(self, size=RESERVOIR_SIZE):
+        self.size = size
+        self.samples = []
+        self._seen = itertools.count(1)
+
+    def add(self, value):
+        seen = next(self._seen)
+        if seen <= self.size:
+            self.samples.append(value)
+        else:
+            position = random.randrange(seen)
+            if position < self.size:
+                self.samples[position] = value
+
+
+# every thread adds to its own totals, which are only summed when the metrics are
+# read, so recording a request takes no lock and threads never contend
+_shards = []
+_local = threading.local()
+
+_reservoirs = {}
+_flagged = {}
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = {}
+        _shards.append(shard)
+    return shard
+
+
+def _execute(execute, sql, params, many, context):
+    """Database execute wrapper that adds every query to the current request."""
+
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.query_time += time.perf_counter() - start
+        metrics.statements[sql] += 1
+
+
+def _install(connection):
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    """Counts the queries of connections opened in any thread, e.g. by sync_to_async."""
+
+    _install(connection)
+
+
+@receiver(cache_accessed)
+def cache_used(sender, namespace, hit, **kwargs):
+    """Counts cache lookups of the current request."""
+
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+def view_name(request):
+    """Returns the URL name of the view that handled a request, e.g. "auctions:index"."""
+
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else UNRESOLVED
+
+
+def record(view, duration, metrics, origin=None):
+    """Adds a finished request to the totals of its view. Statements that were run
+      at least N_PLUS_ONE_THRESHOLD times are flagged and logged with the view and
+      origin, the dotted path of the view function."""
+
+    totals = _shard().get(view)
+    if totals is None:
+        totals = _shard()[view] = ViewTotals()
+
+    totals.requests += 1
+    totals.duration += duration
+    totals.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+    totals.queries += metrics.queries
+    totals.query_time += metrics.query_time
+    totals.template_time += metrics.template_time
+    totals.cache_hits += metrics.cache_hits
+    totals.cache_misses += metrics.cache_misses
+
+    reservoir = _reservoirs.get(view) or _reservoirs.setdefault(view, Reservoir())
+    reservoir.add(duration)
+
+    repeated = [(sql, count) for sql, count in metrics.statements.items() if count >= N_PLUS_ONE_THRESHOLD]
+    if repeated:
+        totals.n_plus_one += 1
+        flagged = _flagged.setdefault(view, {})
+        for sql, count in repeated:
+            if sql in flagged or len(flagged) < MAX_FLAGGED_QUERIES:
+                flagged[sql] = {"origin": origin, "count": count}
+            logger.warning("Possible N+1 queries in %s (%s): %d times %s", view, origin, count, sql)
+
+
+def view_totals():
+    """Returns the totals of all threads as a dictionary of ViewTotals per view."""
+
+    merged = {}
+    for shard in list(_shards):
+        for view, totals in list(shard.items()):
+            merged.setdefault(view, ViewTotals()).add(totals)
+    return merged
+
+
+def flagged_queries():
+    """Returns the statements flagged as N+1 patterns per view, with the origin and
+      the number of times they ran in the last flagged request."""
+
+    return {view: dict(flagged) for view, flagged in _flagged.items()}
+
+
+def percentiles(view):
+    """Returns the 50th, 95th and 99th latency percentile in seconds of the sampled
+      requests to a view."""
+
+    samples = sorted(_reservoirs[view].samples) if view in _reservoirs else []
+    if not samples:
+        return 0, 0, 0
+    return tuple(samples[min(int(fraction * len(samples)), len(samples) - 1)] for fraction in (0.5, 0.95, 0.99))
+
+
+def reset():
+    """Forgets all recorded requests."""
+
+    for shard in list(_shards):
+        shard.clear()
+    _reservoirs.clear()
+    _flagged.clear()
+
+
+class InstrumentationMiddleware:
+    """Measures every request and records it with the name of its view. Works for
+      sync and async views, for streaming responses only the time until the response
+      started is measured. Should be the first middleware, so it measures the others."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, metrics, start)
+        return response
+
+    async def __acall__(self, request):
+        metrics, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, metrics, start)
+        return response
+
+    def start(self):
+        # connections opened before this module was loaded missed connection_created
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        metrics = RequestMetrics()
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    def finish(self, request, metrics, start):
+        match = getattr(request, "resolver_match", None)
+        record(view_name(request), time.perf_counter() - start, metrics, match._func_path if match else None)
+
+
+class InstrumentedTemplate(Template):
+    """A template that adds its render time to the current request."""
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        # templates rendered while rendering another one are already timed
+        if metrics is None or metrics.rendering:
+            return super().render(context, request)
+
+        metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.rendering = False
+            metrics.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render times counted per request."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
+
+
+def _labels(**labels):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+# counters exported per view, with the ViewTotals field they come from
+PROMETHEUS_COUNTERS = [
+    ("commerce_sql_queries_total", "queries", "SQL queries run by a view."),
+    ("commerce_sql_query_seconds_total", "query_time", "Time spent in SQL queries by a view."),
+    ("commerce_template_render_seconds_total", "template_time", "Time spent rendering templates by a view."),
+    ("commerce_cache_hits_total", "cache_hits", "Cache lookups of a view that were hits."),
+    ("commerce_cache_misses_total", "cache_misses", "Cache lookups of a view that were misses."),
+    ("commerce_n_plus_one_requests_total", "n_plus_one", "Requests of a view flagged for repeated SQL."),
+]
+
+
+def prometheus_text():
+    """Returns the metrics of all views in the Prometheus text exposition format."""
+
+    totals = sorted(view_totals().items())
+    name = "commerce_request_duration_seconds"
+    lines = [f"# HELP {name} Time until the response of a view started.", f"# TYPE {name} histogram"]
+    for view, view_total in totals:
+        cumulative = itertools.accumulate(view_total.buckets)
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), cumulative):
+            lines.append(f"{name}_bucket{_labels(view=view, le=bound)} {count}")
+        lines.append(f"{name}_sum{_labels(view=view)} {view_total.duration}")
+        lines.append(f"{name}_count{_labels(view=view)} {view_total.requests}")
+
+    for name, field, help_text in PROMETHEUS_COUNTERS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f"{name}{_labels(view=view)} {getattr(view_total, field)}" for view, view_total in totals]
+
+    return "\n".join(lines) + "\n"
+
+
+def metrics(request):
+    """Serves the metrics to Prometheus, which must send settings.METRICS_TOKEN as a
+      bearer token. Without a token only staff users may read them."""
+
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if not token:
+        if not request.user.is_staff:
+            return HttpResponseForbidden("Set METRICS_TOKEN to serve the metrics.")
+    elif not hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+        return HttpResponseForbidden("Invalid metrics token.")
+
+    return HttpResponse(prometheus_text(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def performance(request):
+    """Renders the admin page with the metrics per view, slowest views first."""
+
+    views = []
+    for view, totals in view_totals().items():
+        p50, p95, p99 = percentiles(view)
+        lookups = totals.cache_hits + totals.cache_misses
+        views.append({
+            "name": view,
+            "requests": totals.requests,
+            "mean_ms": 1000 * totals.duration / totals.requests,
+            "p50_ms": 1000 * p50,
+            "p95_ms": 1000 * p95,
+            "p99_ms": 1000 * p99,
+            "queries": totals.queries / totals.requests,
+            "query_ms": 1000 * totals.query_time / totals.requests,
+            "template_ms": 1000 * totals.template_time / totals.requests,
+            "cache_hit_ratio": totals.cache_hits / lookups if lookups else None,
+            "n_plus_one": totals.n_plus_one,
+        })
+    views.sort(key=lambda view: view["p95_ms"], reverse=True)
+
+    return render(request, "commerce/performance.html", {
+        **admin.site.each_context(request),
+        "title": "Performance",
+        "views": views,
+        "flagged": flagged_queries(),
+    })
@@ -0,0 +1,141 @@
+import functools
+import hashlib
+import logging
+import math
+import re
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+
+logger = logging.getLogger(__name__)
+
+# seconds per unit of a rate like "30/m"
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# methods that are never limited, they only read
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# views whose clients expect JSON errors
+JSON_MODULES = ("auctions.api",)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Returns the number of requests and period in seconds of a rate like "30/m",
+      "5/10s" or "1000/d"."""
+
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*", rate)
+    if match == None or int(match[1]) < 1:
+        raise ImproperlyConfigured(f"Invalid rate {rate!r}, use e.g. '30/m' or '5/10s'.")
+    return int(match[1]), int(match[2] or 1) * PERIODS[match[3]]
+
+
+def _identities(request):
+    """Returns who sent the request per scope. The user is read from the session,
+      which comes from the cache, so the user is not loaded from the database."""
+
+    identities = {"ip": request.META.get("REMOTE_ADDR", "")}
+    user_id = request.session.get(SESSION_KEY) if hasattr(request, "session") else None
+    if user_id != None:
+        identities["user"] = str(user_id)
+    # attempts on one account from many addresses
+    if "username" in request.POST:
+        identities["username"] = request.POST["username"].lower()
+    return identities
+
+
+def _key(name, scope, identity, window):
+    digest = hashlib.md5(identity.encode()).hexdigest()
+    return f"auctions:ratelimit:{name}:{scope}:{digest}:{window}"
+
+
+def _retry_after(limit, period, previous, current, elapsed):
+    """Returns the seconds until one more request fits in a sliding window with the
+      given counts of the previous and current fixed window."""
+
+    if current + 1 > limit:
+        # in the next window the current count fades out like the previous one does now
+        return period - elapsed + (1 - (limit - 1) / current) * period
+    return (1 - (limit - 1 - current) / previous) * period - elapsed
+
+
+def check_rate(name, rules, identities, now=None):
+    """Counts a request to the view name against its rules, a dict of scope ("user",
+      "ip" or "username") to rate, unless one of them is exhausted. Returns None if
+      the request is allowed or the seconds until it would be. Scopes without an
+      identity, e.g. "user" for anonymous requests, are skipped.
+
+      The limits are sliding windows, estimated from counters of two fixed windows
+      in the cache: the previous window's count weighted by how much of it still
+      overlaps the sliding window, plus the current one's. A rejected request reads
+      the counters once and writes nothing."""
+
+    now = time.time() if now == None else now
+    windows = {}
+    for scope, rate in rules.items():
+        if scope not in identities:
+            continue
+        limit, period = parse_rate(rate)
+        window = int(now // period)
+        windows[scope] = (limit, period, _key(name, scope, identities[scope], window - 1),
+                          _key(name, scope, identities[scope], window))
+
+    counts = cache.get_many([key for *_, previous, current in windows.values() for key in (previous, current)])
+
+    retry_after = None
+    for scope, (limit, period, previous_key, current_key) in windows.items():
+        previous, current, elapsed = counts.get(previous_key, 0), counts.get(current_key, 0), now % period
+        if previous * (1 - elapsed / period) + current + 1 > limit:
+            wait = _retry_after(limit, period, previous, current, elapsed)
+            retry_after = max(retry_after or 0, wait)
+    if retry_after != None:
+        return retry_after
+
+    for limit, period, previous_key, current_key in windows.values():
+        # the counter is kept until it is the previous window of the next one
+        if not cache.add(current_key, 1, 2 * period):
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                cache.set(current_key, 1, 2 * period)
+    return None
+
+
+def throttled_response(request, view_func, retry_after):
+    """Returns the 429 response of a rejected request, JSON for the API."""
+
+    seconds = max(1, math.ceil(retry_after))
+    message = f"Too many requests, try again in {seconds} seconds."
+    if getattr(view_func, "__module__", None) in JSON_MODULES:
+        response = JsonResponse({"error": message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type="text/plain; charset=utf-8")
+    response["Retry-After"] = str(seconds)
+    return response
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """Limits the requests that change something, per URL name, to the rates in the
+      RATE_LIMITS setting. Requests over a limit get status 429 with a Retry-After
+      header before the view, and so the database, is reached. Must come after the
+      session middleware."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in SAFE_METHODS:
+            return None
+        name = request.resolver_match.view_name
+        rules = settings.RATE_LIMITS.get(name)
+        if not rules:
+            return None
+
+        retry_after = check_rate(name, rules, _identities(request))
+        if retry_after == None:
+            return None
+        logger.info("Throttled %s from %s", name, request.META.get("REMOTE_ADDR"))
+        return throttled_response(request, view_func, retry_after)
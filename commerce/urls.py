@@ -13,10 +13,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from . import compression, instrumentation
+
 urlpatterns = [
+    path("admin/performance/", admin.site.admin_view(instrumentation.performance), name="performance"),
     path("admin/", admin.site.urls),
+    path("metrics", instrumentation.metrics, name="metrics"),
     path("auctions/", include("auctions.urls"))
-]
\ No newline at end of file
+]
+
+# collected static files, precompressed and cached by clients, see commerce/compression.py
+if settings.SERVE_STATIC:
+    urlpatterns.append(path(settings.STATIC_URL.lstrip("/") + "<path:path>", compression.serve_static,
+                            {"document_root": settings.STATIC_ROOT}, name="static"))